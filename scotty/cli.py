@@ -2,17 +2,19 @@ import sys
 import argparse
 
 from scotty.cmd.base import CommandRegistry
-# The imports are not used, but are required to load the commands on startup.
-import scotty.cmd.workload
-import scotty.cmd.experiment
-import scotty.cmd.resource
+
+# The command modules are imported when the command is used.
+CommandRegistry.register('workload', 'scotty.cmd.workload')
+CommandRegistry.register('experiment', 'scotty.cmd.experiment')
+CommandRegistry.register('resource', 'scotty.cmd.resource')
+CommandRegistry.register('cache', 'scotty.cmd.cache')
 
 
 class Cli(object):
     def parse_command(self, args):
         parser = argparse.ArgumentParser()
         subparser = parser.add_subparsers(dest='command')
-        for key in CommandRegistry.registry:
+        for key in CommandRegistry.getcommands():
             subparser.add_parser(key)
         options = parser.parse_args(args)
         self.command_builder = CommandRegistry.getbuilder(options.command)
@@ -1,8 +1,27 @@
+import importlib
 from collections import defaultdict
+from collections import OrderedDict
 
 
 class CommandRegistry(object):
     registry = defaultdict(dict)
+    modules = OrderedDict()
+
+    @classmethod
+    def register(cls, command, module_name):
+        """Register the module of a command, imported when the command is used"""
+        cls.modules[command] = module_name
+
+    @classmethod
+    def getcommands(cls):
+        commands = list(cls.modules)
+        commands += [key for key in cls.registry if key not in cls.modules]
+        return commands
+
+    @classmethod
+    def load(cls, command):
+        if 'command' not in cls.registry.get(command, {}) and command in cls.modules:
+            importlib.import_module(cls.modules[command])
 
     @classmethod
     def parser(cls, parser_class):
@@ -25,16 +44,19 @@ class CommandRegistry(object):
 
     @classmethod
     def getbuilder(cls, command):
+        cls.load(command)
         builder_class = cls.registry[command].get('builder', CommandBuilder)
         return builder_class()
 
     @classmethod
     def getparser(cls, command):
+        cls.load(command)
         parser_class = cls.registry[command].get('parser', CommandParser)
         return parser_class()
 
     @classmethod
     def getcommand_class(cls, command):
+        cls.load(command)
         return cls.registry[command]['command']
 
 
@@ -0,0 +1,53 @@
+import logging
+
+from scotty.cmd.base import CommandParser
+from scotty.cmd.base import CommandRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@CommandRegistry.parser
+class CacheParser(CommandParser):
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(
+            help='Action',
+            dest='action')
+        gcparser = subparsers.add_parser('gc')
+        GcParser().add_arguments(gcparser)
+
+
+class GcParser(CommandParser):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-w', '--workspace',
+            help='Path to experiment workspace',
+            dest='workspace',
+            action='store',
+            default='./')
+        parser.add_argument(
+            '--max-size',
+            help='Maximum size of the component store (e.g. 500M, 2G)',
+            dest='max_size',
+            action='store')
+        parser.add_argument(
+            '--max-age',
+            help='Maximum age of unused store entries (e.g. 12h, 7d)',
+            dest='max_age',
+            action='store')
+        parser.add_argument(
+            '--grace',
+            help='Keep store entries used within this time (e.g. 0, 30m, default 1h)',
+            dest='grace',
+            action='store')
+
+
+@CommandRegistry.command
+class Command(object):
+    def __init__(self, options):
+        self.options = options
+
+    def execute(self):
+        from scotty.workflows.cache import CacheGcWorkflow
+        if self.options.action == 'gc':
+            workflow = CacheGcWorkflow(self.options)
+            workflow.run()
@@ -2,8 +2,6 @@ import logging
 
 from scotty.cmd.base import CommandParser
 from scotty.cmd.base import CommandRegistry
-from scotty.workflows.experiment import ExperimentPerformWorkflow
-from scotty.workflows.experiment import ExperimentCleanWorkflow
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +54,8 @@ class Command(object):
         self.options = options
 
     def execute(self):
+        from scotty.workflows.experiment import ExperimentPerformWorkflow
+        from scotty.workflows.experiment import ExperimentCleanWorkflow
         if self.options.action == 'perform':
             workflow = ExperimentPerformWorkflow(self.options)
             workflow.run()
@@ -4,7 +4,6 @@ from aenum import Enum
 
 from scotty.cmd.base import CommandParser
 from scotty.cmd.base import CommandRegistry
-from scotty.workflows.workflows import ResourceInitWorkflow
 from scotty.core.exceptions import ScottyException
 
 logger = logging.getLogger(__name__)
@@ -37,6 +36,7 @@ class Command(object):
     def execute(self):
         commandAction = CommandAction(self.options.action)
         if commandAction is CommandAction.init:
+            from scotty.workflows.workflows import ResourceInitWorkflow
             try:
                 workflow = ResourceInitWorkflow(self.options)
                 workflow.run()
@@ -3,7 +3,6 @@ from aenum import Enum
 
 from scotty.cmd.base import CommandParser
 from scotty.cmd.base import CommandRegistry
-from scotty.workflows.workflows import WorkloadInitWorkflow
 from scotty.core.exceptions import ScottyException
 
 logger = logging.getLogger(__name__)
@@ -41,6 +40,7 @@ class Command(object):
     def execute(self):
         commandAction = CommandAction(self.options.action)
         if commandAction is CommandAction.init:
+            from scotty.workflows.workflows import WorkloadInitWorkflow
             try:
                 workflow = WorkloadInitWorkflow(self.options)
                 workflow.run()
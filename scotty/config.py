@@ -51,6 +51,9 @@ class ScottyConfig(object):
         if section in self._raw_config:
             return self._raw_config[section].get(option, False)
 
+    def has_option(self, section, option):
+        return self._config.has_option(section, option)
+
     def get(self, section, option, abspath=False):
         value = self._config.get(section, option, self._is_raw(
             section, option))
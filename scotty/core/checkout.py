@@ -1,74 +1,649 @@
+import errno
+import fcntl
+import fnmatch
+import hashlib
 import logging
 import os
+import re
+import tarfile
+import threading
+import urllib2
+import uuid
+import zipfile
+from contextlib import contextmanager
 
-import git
 import shutil
+from concurrent import futures
 
+from scotty.config import ScottyConfig
 from scotty.core.exceptions import ScottyException
 
 logger = logging.getLogger(__name__)
 
 
+class FileLock(object):
+    """Lock on a path between threads and between scotty processes."""
+    _locks = {}
+    _locks_lock = threading.Lock()
+
+    @classmethod
+    @contextmanager
+    def lock(cls, path):
+        with cls._locks_lock:
+            thread_lock = cls._locks.setdefault(path, threading.RLock())
+        with thread_lock:
+            lock_dir = os.path.dirname(path)
+            if not os.path.isdir(lock_dir):
+                try:
+                    os.makedirs(lock_dir)
+                except OSError:
+                    if not os.path.isdir(lock_dir):
+                        raise
+            with open(path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @classmethod
+    @contextmanager
+    def try_lock(cls, path):
+        """Lock the path if it is not locked, yields whether it is locked now"""
+        with cls._locks_lock:
+            thread_lock = cls._locks.setdefault(path, threading.RLock())
+        if not thread_lock.acquire(False):
+            yield False
+            return
+        try:
+            with open(path + '.lock', 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except IOError as error:
+                    if error.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+
+class GitMirrorCache(object):
+    """Host level cache of bare git mirrors keyed by the normalized git url.
+
+    The cache directory is configured with git_mirror_dir in the [cache]
+    section of scotty.conf. Without this option the cache is disabled. The
+    mirrors are created once and updated incrementally. Access to a mirror is
+    serialized per url between threads and between scotty processes.
+    """
+    _pattern_scp_url = re.compile(r'^(?:[^@/]+@)?([^:/]+):(?!//)(.*)$')
+    _pattern_url = re.compile(r'^[a-z][a-z0-9+.-]*://(?:[^@/]+@)?([^/]+)(.*)$')
+
+    @classmethod
+    def get_mirror_dir(cls):
+        scotty_config = ScottyConfig()
+        if not scotty_config.has_option('cache', 'git_mirror_dir'):
+            return None
+        if not scotty_config.get('cache', 'git_mirror_dir'):
+            return None
+        return scotty_config.get('cache', 'git_mirror_dir', True)
+
+    @classmethod
+    def normalize_url(cls, git_url):
+        url = git_url.strip().rstrip('/')
+        if url.endswith('.git'):
+            url = url[:-len('.git')]
+        match = cls._pattern_url.match(url) or cls._pattern_scp_url.match(url)
+        if match:
+            host, path = match.groups()
+            return '{}/{}'.format(host.lower(), path.strip('/'))
+        return os.path.abspath(url)
+
+    @classmethod
+    def get_mirror_path(cls, git_url):
+        mirror_dir = cls.get_mirror_dir()
+        if not mirror_dir:
+            return None
+        normalized_url = cls.normalize_url(git_url)
+        url_hash = hashlib.sha1(normalized_url).hexdigest()[:12]
+        name = re.sub(r'[^A-Za-z0-9._-]+', '_', normalized_url).strip('_')
+        return os.path.join(mirror_dir, '{}-{}.git'.format(name[-64:], url_hash))
+
+    @classmethod
+    def get(cls, git_url):
+        mirror_path = cls.get_mirror_path(git_url)
+        if not mirror_path:
+            return None
+        with cls.lock(mirror_path):
+            if not os.path.isdir(mirror_path):
+                cls._create(git_url, mirror_path)
+        return mirror_path
+
+    @classmethod
+    def update(cls, git_url):
+        mirror_path = cls.get_mirror_path(git_url)
+        if not mirror_path:
+            return None
+        import git
+        with cls.lock(mirror_path):
+            if os.path.isdir(mirror_path):
+                logger.info('Update git mirror {}'.format(mirror_path))
+                git.Repo(mirror_path).git.remote('update', '--prune')
+            else:
+                cls._create(git_url, mirror_path)
+        return mirror_path
+
+    @classmethod
+    def _create(cls, git_url, mirror_path):
+        import git
+        logger.info('Create git mirror {} for {}'.format(mirror_path, git_url))
+        git.Repo.clone_from(git_url, mirror_path, mirror=True)
+
+    @classmethod
+    @contextmanager
+    def lock(cls, mirror_path):
+        with FileLock.lock(mirror_path):
+            yield
+
+
+class FileSync(object):
+    """Incremental synchronisation of a source tree into a target tree.
+
+    Only new and changed files are copied and files which no longer exist in
+    the source are removed. Files are compared by size and mtime or, with
+    compare='hash', by the sha1 of their content. With link='hardlink' or
+    link='reflink' the files are linked or cloned instead of copied, falling
+    back to a copy where the filesystem does not support it.
+    """
+    compares = ['mtime', 'hash']
+    links = [None, 'hardlink', 'reflink']
+    ficlone = 0x40049409
+
+    @classmethod
+    def sync(cls, source_path, target_path, compare='mtime', link=None, ignore=('.scotty',)):
+        if compare not in cls.compares or link not in cls.links:
+            msg = 'Unsupported file sync (compare: {}, link: {})'.format(compare, link)
+            raise ScottyException(msg)
+        source_path = os.path.abspath(source_path)
+        target_path = os.path.abspath(target_path)
+        synced_paths = set()
+        for source_dir, dirs, files in os.walk(source_path, followlinks=True):
+            dirs[:] = [dir_ for dir_ in dirs if not cls._is_ignored(dir_, ignore)]
+            rel_dir = os.path.relpath(source_dir, source_path)
+            target_dir = os.path.normpath(os.path.join(target_path, rel_dir))
+            cls._make_dir(target_dir)
+            synced_paths.add(target_dir)
+            for file_ in files:
+                if cls._is_ignored(file_, ignore):
+                    continue
+                source_file = os.path.join(source_dir, file_)
+                target_file = os.path.join(target_dir, file_)
+                synced_paths.add(target_file)
+                if not cls._is_unchanged(source_file, target_file, compare, link):
+                    cls._sync_file(source_file, target_file, link)
+        cls._remove_deleted(target_path, synced_paths)
+
+    @classmethod
+    def _is_ignored(cls, name, ignore):
+        return any(fnmatch.fnmatch(name, pattern) for pattern in ignore)
+
+    @classmethod
+    def _make_dir(cls, path):
+        if os.path.islink(path) or os.path.isfile(path):
+            os.remove(path)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    @classmethod
+    def _is_unchanged(cls, source_file, target_file, compare, link):
+        if not os.path.isfile(target_file) or os.path.islink(target_file):
+            return False
+        if link == 'hardlink' and os.path.samefile(source_file, target_file):
+            return True
+        source_stat = os.stat(source_file)
+        target_stat = os.stat(target_file)
+        if source_stat.st_size != target_stat.st_size:
+            return False
+        if compare == 'hash':
+            return cls.hash_file(source_file) == cls.hash_file(target_file)
+        return int(source_stat.st_mtime) == int(target_stat.st_mtime)
+
+    @classmethod
+    def hash_file(cls, path):
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as file_:
+            for chunk in iter(lambda: file_.read(1024 * 1024), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    @classmethod
+    def _sync_file(cls, source_file, target_file, link):
+        if os.path.lexists(target_file):
+            if os.path.isdir(target_file) and not os.path.islink(target_file):
+                shutil.rmtree(target_file)
+            else:
+                os.remove(target_file)
+        if link == 'hardlink' and cls._hardlink(source_file, target_file):
+            return
+        if link == 'reflink' and cls._reflink(source_file, target_file):
+            return
+        shutil.copy2(source_file, target_file)
+
+    @classmethod
+    def _hardlink(cls, source_file, target_file):
+        try:
+            os.link(source_file, target_file)
+            return True
+        except OSError as error:
+            if error.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            return False
+
+    @classmethod
+    def _reflink(cls, source_file, target_file):
+        with open(source_file, 'rb') as source, open(target_file, 'wb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), cls.ficlone, source.fileno())
+            except IOError:
+                return False
+        shutil.copystat(source_file, target_file)
+        return True
+
+    @classmethod
+    def _remove_deleted(cls, target_path, synced_paths):
+        for target_dir, dirs, files in os.walk(target_path, topdown=False):
+            for name in files + dirs:
+                path = os.path.join(target_dir, name)
+                if path in synced_paths:
+                    continue
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+
+class ArchiveCache(object):
+    """Host level cache of downloaded and extracted tar and zip archives.
+
+    Archives are extracted once into <archive_dir>/<algorithm>-<digest>,
+    keyed by the checksum of the archive. With a checksum in the generator
+    a cached extraction is used without reading or downloading the archive.
+    The directory is configured with archive_dir in the [cache] section of
+    scotty.conf and defaults to .scotty/archives in the experiment workspace.
+    """
+    algorithms = ['md5', 'sha1', 'sha256', 'sha512']
+    default_algorithm = 'sha256'
+    _pattern_url = re.compile(r'^(https?|ftp|file)://', re.IGNORECASE)
+
+    @classmethod
+    def get_archive_dir(cls, base_path):
+        scotty_config = ScottyConfig()
+        if scotty_config.has_option('cache', 'archive_dir'):
+            if scotty_config.get('cache', 'archive_dir'):
+                return scotty_config.get('cache', 'archive_dir', True)
+        return os.path.join(base_path, '.scotty', 'archives')
+
+    @classmethod
+    def parse_checksum(cls, checksum):
+        if not checksum:
+            return None
+        algorithm, _, digest = checksum.rpartition(':')
+        algorithm = algorithm.lower() or cls.default_algorithm
+        if algorithm not in cls.algorithms or not re.match(r'^[0-9a-fA-F]+$', digest):
+            raise ScottyException('Invalid archive checksum {}'.format(checksum))
+        return algorithm, digest.lower()
+
+    @classmethod
+    def hash_file(cls, path, algorithm):
+        hash_ = hashlib.new(algorithm)
+        with open(path, 'rb') as file_:
+            for chunk in iter(lambda: file_.read(1024 * 1024), b''):
+                hash_.update(chunk)
+        return hash_.hexdigest()
+
+    @classmethod
+    def is_url(cls, location):
+        return cls._pattern_url.match(location) is not None
+
+    @classmethod
+    def get(cls, location, archive_type, base_path, checksum=None):
+        """Return the path of the extracted archive"""
+        archive_dir = cls.get_archive_dir(base_path)
+        checksum = cls.parse_checksum(checksum)
+        if checksum:
+            extract_path = os.path.join(archive_dir, '{}-{}'.format(*checksum))
+            if os.path.isdir(extract_path):
+                os.utime(extract_path, None)
+                return extract_path
+        if cls.is_url(location):
+            archive_path = cls._download(location, archive_dir, checksum)
+        else:
+            archive_path = os.path.join(base_path, location)
+        algorithm = checksum[0] if checksum else cls.default_algorithm
+        digest = cls.hash_file(archive_path, algorithm)
+        if checksum and digest != checksum[1]:
+            msg = 'Checksum mismatch for archive {} ({}:{})'.format(location, algorithm, digest)
+            raise ScottyException(msg)
+        extract_path = os.path.join(archive_dir, '{}-{}'.format(algorithm, digest))
+        with FileLock.lock(extract_path):
+            if not os.path.isdir(extract_path):
+                cls._extract(archive_path, archive_type, extract_path)
+        return extract_path
+
+    @classmethod
+    def _download(cls, url, archive_dir, checksum):
+        url_hash = hashlib.sha1(url).hexdigest()[:12]
+        name = re.sub(r'[^A-Za-z0-9._-]+', '_', url.rsplit('/', 1)[-1])
+        archive_path = os.path.join(archive_dir, 'downloads', '{}-{}'.format(url_hash, name[-64:]))
+        with FileLock.lock(archive_path):
+            if os.path.isfile(archive_path):
+                if not checksum or cls.hash_file(archive_path, checksum[0]) == checksum[1]:
+                    return archive_path
+            logger.info('Download archive {}'.format(url))
+            tmp_path = '{}.tmp-{}'.format(archive_path, uuid.uuid4().hex)
+            try:
+                response = urllib2.urlopen(url)
+                with open(tmp_path, 'wb') as archive_file:
+                    shutil.copyfileobj(response, archive_file)
+                os.rename(tmp_path, archive_path)
+            except (IOError, OSError) as error:
+                raise ScottyException('Could not download archive {}: {}'.format(url, error))
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return archive_path
+
+    @classmethod
+    def _extract(cls, archive_path, archive_type, extract_path):
+        logger.debug('Extract archive {}'.format(archive_path))
+        tmp_path = '{}.tmp-{}'.format(extract_path, uuid.uuid4().hex)
+        try:
+            if archive_type == 'tar':
+                cls._extract_tar(archive_path, tmp_path)
+            elif archive_type == 'zip':
+                cls._extract_zip(archive_path, tmp_path)
+            else:
+                raise ScottyException('Unsupported archive type {}'.format(archive_type))
+            os.rename(cls._get_root(tmp_path), extract_path)
+        except (tarfile.TarError, zipfile.BadZipfile) as error:
+            raise ScottyException('Could not extract archive {}: {}'.format(archive_path, error))
+        finally:
+            if os.path.isdir(tmp_path):
+                shutil.rmtree(tmp_path)
+
+    @classmethod
+    def _extract_tar(cls, archive_path, target_path):
+        with tarfile.open(archive_path) as archive:
+            members = archive.getmembers()
+            for member in members:
+                cls._verify_member(archive_path, member.name)
+                if member.issym() or member.islnk():
+                    link = os.path.join(os.path.dirname(member.name), member.linkname)
+                    if member.islnk():
+                        link = member.linkname
+                    cls._verify_member(archive_path, link)
+                elif not (member.isfile() or member.isdir()):
+                    msg = 'Unsupported member {} in archive {}'
+                    raise ScottyException(msg.format(member.name, archive_path))
+            archive.extractall(target_path, members)
+
+    @classmethod
+    def _extract_zip(cls, archive_path, target_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for name in archive.namelist():
+                cls._verify_member(archive_path, name)
+            archive.extractall(target_path)
+
+    @classmethod
+    def _verify_member(cls, archive_path, name):
+        normalized_name = os.path.normpath(name)
+        if os.path.isabs(normalized_name) or normalized_name.split(os.sep)[0] == '..':
+            msg = 'Unsafe path {} in archive {}'.format(name, archive_path)
+            raise ScottyException(msg)
+
+    @classmethod
+    def _get_root(cls, path):
+        # Archives with a single top level directory are extracted without it
+        names = os.listdir(path)
+        if len(names) == 1 and os.path.isdir(os.path.join(path, names[0])):
+            root_path = os.path.join(path, names[0])
+            if not os.path.islink(root_path):
+                return root_path
+        return path
+
+
 class CheckoutManager(object):
+    _pattern_commit_sha = re.compile(r'^[0-9a-fA-F]{7,40}$')
+    _pattern_url_parent = re.compile(r'^(.*)([/:])[^/:]*$')
+
     @classmethod
-    def populate(cls, component, base_path):
+    def populate(cls, component, base_path, workspace=None):
         generator = component.generator
+        workspace = workspace or component.workspace
         if generator['type'] == "git":
-            cls.checkout(generator['location'], component.workspace, generator['reference'])
+            cls.checkout(
+                generator['location'],
+                workspace,
+                generator['reference'],
+                generator)
         elif generator['type'] == "file":
-            cls.copy(component, generator['location'], base_path)
+            cls.copy(component, generator['location'], base_path, workspace)
+        elif generator['type'] in ["tar", "zip"]:
+            cls.extract(component, base_path, workspace)
         else:
-            raise ScottyException('Unsupported source type, Use "git" or "file"')
+            raise ScottyException('Unsupported source type, Use "git", "file", "tar" or "zip"')
 
     @classmethod
-    def copy(cls, component, source_path, base_path):
+    def copy(cls, component, source_path, base_path, workspace=None):
         if os.path.isabs(source_path):
             error_message = 'Source ({}) for component ({}) must be relative'.format(
                 source_path,
                 component.name)
             logger.error(error_message)
             raise ScottyException(error_message)
-        source_path_abs = os.path.join(base_path, source_path, '.')
-        shutil.rmtree(component.workspace.path, True)
-        ignore_scotty = shutil.ignore_patterns(".scotty")
-        shutil.copytree(source_path_abs, component.workspace.path, ignore=ignore_scotty)
+        source_path_abs = os.path.join(base_path, source_path)
+        if not os.path.isdir(source_path_abs):
+            error_message = 'Source ({}) for component ({}) does not exist'.format(
+                source_path_abs,
+                component.name)
+            logger.error(error_message)
+            raise ScottyException(error_message)
+        generator = component.generator
+        workspace = workspace or component.workspace
+        FileSync.sync(
+            source_path_abs,
+            workspace.path,
+            generator['compare'] or 'mtime',
+            generator['link'])
 
     @classmethod
-    def checkout(cls, git_url, workspace, git_ref=None):
-        repo = cls._get_repo(git_url, workspace)
-        cls._sync_repo(repo)
-        cls._checkout_ref(repo, git_ref)
-        cls._init_submodules(workspace, repo)
+    def extract(cls, component, base_path, workspace=None):
+        generator = component.generator
+        location = generator['location']
+        if os.path.isabs(location):
+            error_message = 'Source ({}) for component ({}) must be relative'.format(
+                location,
+                component.name)
+            logger.error(error_message)
+            raise ScottyException(error_message)
+        extract_path = ArchiveCache.get(
+            location,
+            generator['type'],
+            base_path,
+            generator['reference'])
+        workspace = workspace or component.workspace
+        FileSync.sync(
+            extract_path,
+            workspace.path,
+            generator['compare'] or 'mtime',
+            generator['link'] or 'hardlink')
+
+    @classmethod
+    def checkout(cls, git_url, workspace, git_ref=None, options=None):
+        """Checkout git_ref of git_url into the workspace.
+
+        The options 'depth' (shallow clone), 'filter' (partial clone, e.g.
+        'blob:none') and 'sparse' (list of sparse checkout patterns) reduce
+        the fetched and checked out data. Shallow and partial clones are made
+        from git_url directly instead of the mirror cache.
+        """
+        options = options or {}
+        repo = cls._get_repo(git_url, workspace, options)
+        sparse_changed = cls._configure_sparse_checkout(repo, options.get('sparse'))
+        revision = cls._resolve_pinned_ref(repo, git_ref)
+        if revision is None:
+            revision = cls._fetch_ref(repo, git_url, git_ref, options.get('depth'))
+        cls._checkout_revision(repo, revision, sparse_changed)
+        if sparse_changed and not options.get('sparse'):
+            cls._disable_sparse_checkout(repo)
+        cls._init_submodules(workspace, repo, git_url, options.get('submodule_jobs'))
 
     @classmethod
     def is_git_dir(cls, path):
         return os.path.isdir('{path}/.git'.format(path=path))
 
     @classmethod
-    def _get_repo(cls, git_url, workspace):
-        if not cls.is_git_dir(workspace.path):
-            repo = git.Repo.clone_from(git_url, workspace.path)
-        else:
-            repo = git.Repo(workspace.path)
-        return repo
+    def is_commit_sha(cls, git_ref):
+        return bool(git_ref and cls._pattern_commit_sha.match(git_ref))
+
+    @classmethod
+    def _get_repo(cls, git_url, workspace, options):
+        import git
+        if cls.is_git_dir(workspace.path):
+            return git.Repo(workspace.path)
+        clone_options = {'no_checkout': True}
+        if options.get('depth') or options.get('filter'):
+            if options.get('depth'):
+                clone_options['depth'] = options['depth']
+            if options.get('filter'):
+                clone_options['filter'] = options['filter']
+            return git.Repo.clone_from(git_url, workspace.path, **clone_options)
+        mirror_path = GitMirrorCache.get(git_url)
+        if mirror_path:
+            return git.Repo.clone_from(mirror_path, workspace.path, shared=True, **clone_options)
+        return git.Repo.clone_from(git_url, workspace.path, **clone_options)
+
+    @classmethod
+    def _configure_sparse_checkout(cls, repo, sparse):
+        sparse_checkout_path = os.path.join(repo.git_dir, 'info', 'sparse-checkout')
+        patterns = ''.join('{}\n'.format(pattern) for pattern in sparse or [])
+        previous_patterns = ''
+        if os.path.isfile(sparse_checkout_path):
+            with open(sparse_checkout_path, 'r') as sparse_checkout_file:
+                previous_patterns = sparse_checkout_file.read()
+        if patterns == previous_patterns:
+            return False
+        if not os.path.isdir(os.path.dirname(sparse_checkout_path)):
+            os.makedirs(os.path.dirname(sparse_checkout_path))
+        with open(sparse_checkout_path, 'w') as sparse_checkout_file:
+            # '/*' checks out the full tree again before sparse checkout is disabled
+            sparse_checkout_file.write(patterns or '/*\n')
+        repo.git.config('core.sparseCheckout', 'true')
+        return True
+
+    @classmethod
+    def _disable_sparse_checkout(cls, repo):
+        os.remove(os.path.join(repo.git_dir, 'info', 'sparse-checkout'))
+        repo.git.config('core.sparseCheckout', 'false')
 
     @classmethod
-    def _sync_repo(cls, repo):
-        repo.git.remote('update')
-        repo.git.reset('--hard')
+    def _resolve_pinned_ref(cls, repo, git_ref):
+        """Resolve commit shas and tags which are already in the local object store"""
+        if git_ref is None:
+            return None
+        if cls.is_commit_sha(git_ref):
+            return cls._rev_parse(repo, '{}^{{commit}}'.format(git_ref))
+        return cls._rev_parse(repo, 'refs/tags/{}^{{commit}}'.format(git_ref))
+
+    @classmethod
+    def _rev_parse(cls, repo, rev):
+        import git
+        try:
+            return repo.git.rev_parse('--verify', '--quiet', rev)
+        except git.GitCommandError:
+            return None
+
+    @classmethod
+    def _fetch_ref(cls, repo, git_url, git_ref, depth=None):
+        if repo.remotes.origin.url == GitMirrorCache.get_mirror_path(git_url):
+            GitMirrorCache.update(git_url)
+        fetch_options = []
+        if depth:
+            fetch_options.append('--depth={}'.format(depth))
+        if cls.is_commit_sha(git_ref):
+            repo.git.fetch(*(fetch_options + ['--tags', 'origin']))
+            revision = cls._resolve_pinned_ref(repo, git_ref)
+            if revision is not None:
+                return revision
+        repo.git.fetch(*(fetch_options + ['origin', git_ref or 'HEAD']))
+        return 'FETCH_HEAD'
+
+    @classmethod
+    def _checkout_revision(cls, repo, revision, sparse_changed=False):
+        repo.git.checkout('--force', '--detach', revision)
+        if sparse_changed:
+            repo.git.read_tree('-m', '-u', 'HEAD')
         repo.git.clean('-x', '-f', '-d', '-q')
 
     @classmethod
-    def _checkout_ref(cls, repo, git_ref):
-        if git_ref is not None:
-            repo.remotes.origin.fetch(refspec=git_ref)
-            repo.git.checkout('FETCH_HEAD')
-            repo.git.reset('--hard', 'FETCH_HEAD')
+    def _init_submodules(cls, workspace, repo, git_url, jobs=None):
+        import git
+        if not os.path.isfile('{path}/.gitmodules'.format(path=workspace.path)):
+            return
+        jobs = jobs or cls._get_submodule_jobs()
+        submodule_urls = cls._get_submodule_urls(repo, git_url)
+        repo.git.submodule('init')
+        try:
+            cls._update_submodules(repo, submodule_urls, jobs, GitMirrorCache.get)
+        except git.GitCommandError:
+            logger.info('Update mirrors of submodules for {}'.format(git_url))
+            cls._update_submodules(repo, submodule_urls, jobs, GitMirrorCache.update)
+
+    @classmethod
+    def _get_submodule_jobs(cls):
+        scotty_config = ScottyConfig()
+        if scotty_config.has_option('checkout', 'submodule_jobs'):
+            return int(scotty_config.get('checkout', 'submodule_jobs'))
+        return 4
+
+    @classmethod
+    def _get_submodule_urls(cls, repo, git_url):
+        submodule_urls = {}
+        output = repo.git.config('-f', '.gitmodules', '--get-regexp', r'^submodule\..*\.url$')
+        for line in output.splitlines():
+            key, url = line.split(None, 1)
+            name = key[len('submodule.'):-len('.url')]
+            submodule_urls[name] = cls._resolve_submodule_url(git_url, url)
+        return submodule_urls
+
+    @classmethod
+    def _resolve_submodule_url(cls, git_url, url):
+        """Resolve a submodule url relative to the url of the superproject"""
+        if not url.startswith(('./', '../')):
+            return url
+        base_url = git_url.rstrip('/')
+        separator = '/'
+        while url.startswith(('./', '../')):
+            if url.startswith('../'):
+                base_url, separator = cls._pattern_url_parent.match(base_url).groups()
+                url = url[len('../'):]
+            else:
+                url = url[len('./'):]
+        return '{}{}{}'.format(base_url, separator, url)
 
     @classmethod
-    def _init_submodules(cls, workspace, repo):
-        if os.path.isfile('{path}/.gitmodules'.format(path=workspace.path)):
-            print 'foo'
-            repo.git.submodules('init')
-            repo.git.submodules('sync')
-            repo.git.submodules('update', '--init')
+    def _update_submodules(cls, repo, submodule_urls, jobs, get_mirror):
+        with futures.ThreadPoolExecutor(jobs) as executor:
+            mirror_paths = dict(zip(
+                submodule_urls.keys(),
+                executor.map(get_mirror, submodule_urls.values())))
+        for name, url in submodule_urls.iteritems():
+            repo.git.config('submodule.{}.url'.format(name), mirror_paths[name] or url)
+        # the mirrors are local repositories, which git blocks for submodules by default
+        repo.git(c='protocol.file.allow=always').submodule(
+            'update', '--init', '--jobs', str(jobs))
+        repo.git.submodule('update', '--init', '--recursive', '--jobs', str(jobs))
@@ -1,19 +1,32 @@
+import ast
+import hashlib
+import itertools
+import json
 import logging
 import os
 import sys
-import yaml
+import threading
 import re
+import shutil
 import uuid
 from collections import defaultdict
 
+from concurrent import futures
+
 from aenum import Enum
 
 from scotty.core.checkout import CheckoutManager
+from scotty.core.checkout import FileSync
+from scotty.core.configloader import ConfigLoader
+from scotty.core.reducer import Reducer
+from scotty.core.statistics import Statistics
+from scotty.core.store import ComponentStore
 from scotty.core.moduleloader import ModuleLoader
 from scotty.core.context import ContextAccessible
 from scotty.core.exceptions import ExperimentException
 from scotty.core.exceptions import ScottyException
 from scotty.core.workspace import Workspace, ExperimentWorkspace
+from scotty.utils import parse_duration
 
 logger = logging.getLogger(__name__)
 
@@ -31,35 +44,69 @@ class Component(object):
         self.uuid = uuid.uuid4()
         self.config = None
         self.workspace = None
+        self.base_path = None
         self.starttime = None
         self.endtime = None
+        self.coroutine_interfaces = set()
         self._generator = None
+        self._module = None
+        self._module_lock = threading.Lock()
         self._setaccess('uuid')
         self._setaccess('config')
         self._setaccess('name')
         self._setaccess('starttime')
         self._setaccess('endtime')
+        self._setaccess('base_path')
 
     def _setaccess(self, parameter):
-        ContextAccessible(self.__class__.__name__).setaccess(parameter)
+        ContextAccessible(self.type).setaccess(parameter)
 
     @property
     def name(self):
         return self.config['name']
 
+    @property
+    def module(self):
+        """The component module, imported on first access"""
+        if self._module is None:
+            with self._module_lock:
+                if self._module is None:
+                    self._module = ModuleLoader.load_by_component(self)
+        return self._module
+
+    @module.setter
+    def module(self, module_):
+        self._module = module_
+
+    @property
+    def module_loaded(self):
+        return self._module is not None
+
+    def unload_module(self):
+        with self._module_lock:
+            ModuleLoader.unload(self._module)
+            self._module = None
+
     def issource(self, type_):
         source_type = self.get_source_type()
         same_type = source_type == type_.upper()
         return same_type
 
     def _parse_generator(self):
-        pattern_source_str = re.compile(r'(git|file):([^\[]+)(?:\[([^\]]+)\])?$')
+        pattern_source_str = re.compile(r'(git|file|tar|zip):([^\[]+)(?:\[([^\]]+)\])?$')
         source_str = self.config['generator']
         groups = pattern_source_str.match(source_str).groups()
+        checkout_options = self.config.get('checkout') or {}
         self._generator = {
             "type":groups[0],
             "location":groups[1],
-            "reference":groups[2]
+            "reference":groups[2],
+            "depth":checkout_options.get('depth'),
+            "filter":checkout_options.get('filter'),
+            "sparse":checkout_options.get('sparse') or [],
+            "submodule_jobs":checkout_options.get('submodule_jobs'),
+            "compare":checkout_options.get('compare'),
+            "link":checkout_options.get('link')
         }
 
     @property
@@ -68,6 +115,17 @@ class Component(object):
             self._parse_generator()
         return self._generator
 
+    @property
+    def executor(self):
+        return (self.config or {}).get('executor', 'thread')
+
+    @property
+    def source_key(self):
+        """Key of the populated source, equal for components with the same generator"""
+        generator = json.dumps(self.generator, sort_keys=True)
+        generator_hash = hashlib.sha1(generator).hexdigest()[:16]
+        return '{}-{}'.format(self.generator['type'], generator_hash)
+
     def get_source_type(self):
         source = self.config['generator'].split(':')
         source_type = source[0].upper()
@@ -97,13 +155,21 @@ class Workload(Component):
 
     def __init__(self):
         super(Workload, self).__init__()
-        self.module = None
         self.parent_module_name = 'scotty.workload'
         self.state = WorkloadState.PREPARE
         self.result = None
+        self.runs = None
+        self.repetition = 0
+        self.warmup_run = False
+        self.replica = 0
         self._setaccess('params')
         self._setaccess('resources')
         self._setaccess('result')
+        self._setaccess('runs')
+        self._setaccess('repetition')
+        self._setaccess('warmup_run')
+        self._setaccess('replica')
+        self._setaccess('replicas')
 
     @property
     def module_path(self):
@@ -117,11 +183,213 @@ class Workload(Component):
     def resources(self):
         return self.config['resources']
 
+    @property
+    def matrix(self):
+        return self.config.get('matrix') or {}
+
+    @property
+    def matrix_concurrency(self):
+        concurrency = self.config.get('matrix_concurrency', 'serial')
+        if str(concurrency).strip().lower() == 'serial':
+            return 1
+        if str(concurrency).strip().lower() == 'unbounded':
+            return sys.maxsize
+        try:
+            concurrency = int(concurrency)
+        except ValueError:
+            concurrency = 0
+        if concurrency < 1:
+            msg = ('matrix_concurrency of workload {} must be "serial", "unbounded" '
+                   'or a positive number')
+            raise ScottyException(msg.format(self.name))
+        return concurrency
+
+    @property
+    def repetitions(self):
+        return self._get_count('repetitions', 1, 1)
+
+    @property
+    def warmup(self):
+        return self._get_count('warmup', 0, 0)
+
+    @property
+    def replicas(self):
+        return self._get_count('replicas', 1, 1)
+
+    @property
+    def reducer(self):
+        """Reducer of the replica results, see Reducer"""
+        reducer = self.config.get('reducer', 'list')
+        reducers = reducer.values() if isinstance(reducer, dict) else [reducer]
+        if not all(isinstance(name, basestring) for name in reducers):
+            msg = 'reducer of workload {} must be a name or map result keys to names'
+            raise ScottyException(msg.format(self.name))
+        return reducer
+
+    @property
+    def confidence(self):
+        confidence = self.config.get('confidence', 0.95)
+        if confidence not in Statistics.confidences:
+            msg = 'confidence of workload {} must be one of {}'
+            raise ScottyException(msg.format(self.name, Statistics.confidences))
+        return confidence
+
+    @property
+    def convergence(self):
+        """Stopping rule that repeats run(context) until the results converge.
+
+        Returns None for a fixed number of repetitions.
+        """
+        convergence = self.config.get('convergence')
+        if convergence is None:
+            return None
+        if not isinstance(convergence, dict):
+            msg = 'convergence of workload {} must be a mapping'
+            raise ScottyException(msg.format(self.name))
+        if 'repetitions' in self.config:
+            msg = 'workload {} can not have both repetitions and convergence'
+            raise ScottyException(msg.format(self.name))
+        relative_error = convergence.get('relative_error')
+        if not Statistics.is_number(relative_error) or relative_error <= 0:
+            msg = 'convergence.relative_error of workload {} must be a number > 0'
+            raise ScottyException(msg.format(self.name))
+        metric = convergence.get('metric', 'result')
+        if not isinstance(metric, basestring):
+            msg = 'convergence.metric of workload {} must be a name'
+            raise ScottyException(msg.format(self.name))
+        min_repetitions = self._get_count('min_repetitions', 3, 2, convergence)
+        max_repetitions = None
+        if convergence.get('max_repetitions') is not None:
+            max_repetitions = self._get_count(
+                'max_repetitions', None, min_repetitions, convergence)
+        try:
+            max_time = parse_duration(convergence.get('max_time'))
+        except ScottyException:
+            max_time = None
+        if max_time is None and convergence.get('max_time') is not None:
+            msg = 'convergence.max_time of workload {} must be a duration like 90s or 10m'
+            raise ScottyException(msg.format(self.name))
+        if max_repetitions is None and max_time is None:
+            msg = 'convergence of workload {} needs max_repetitions or max_time'
+            raise ScottyException(msg.format(self.name))
+        return {
+            'metric': metric,
+            'relative_error': relative_error,
+            'min_repetitions': min_repetitions,
+            'max_repetitions': max_repetitions,
+            'max_time': max_time,
+        }
+
+    @property
+    def search(self):
+        """Search of the highest value of a param whose runs meet the slo.
+
+        Returns None without search.
+        """
+        search = self.config.get('search')
+        if search is None:
+            return None
+        if not isinstance(search, dict):
+            msg = 'search of workload {} must be a mapping'
+            raise ScottyException(msg.format(self.name))
+        if self.matrix:
+            msg = 'workload {} can not have both matrix and search'
+            raise ScottyException(msg.format(self.name))
+        for option in ['param', 'metric']:
+            if not isinstance(search.get(option), basestring):
+                msg = 'search.{} of workload {} must be a name'
+                raise ScottyException(msg.format(option, self.name))
+        start = self._get_search_number(search, 'start', 0)
+        slo = self._get_search_number(search, 'slo')
+        factor = self._get_search_number(search, 'factor', 1, 2)
+        max_ = search.get('max')
+        if max_ is not None:
+            max_ = self._get_search_number(search, 'max', start)
+        integer = all(isinstance(value, int) for value in [start, factor, max_ or 0])
+        resolution = self._get_search_number(
+            search, 'resolution', 0, 1 if integer else start * 0.01)
+        return {
+            'param': search['param'],
+            'metric': search['metric'],
+            'slo': slo,
+            'start': start,
+            'max': max_,
+            'factor': factor,
+            'resolution': resolution,
+            'integer': integer,
+            'max_probes': self._get_count('max_probes', 20, 1, search),
+        }
+
+    def _get_search_number(self, search, option, minimum=None, default=None):
+        value = search.get(option, default)
+        if not Statistics.is_number(value) or (minimum is not None and value <= minimum):
+            msg = 'search.{} of workload {} must be a number'
+            if minimum is not None:
+                msg += ' > {}'.format(minimum)
+            raise ScottyException(msg.format(option, self.name))
+        return value
+
+    @property
+    def planned(self):
+        """True if the workload runs more than one plain run(context)"""
+        return (bool(self.matrix) or self.repetitions > 1 or self.warmup > 0 or
+                self.replicas > 1 or self.convergence is not None or
+                self.search is not None)
+
+    def _get_count(self, option, default, minimum, config=None):
+        if config is None:
+            config = self.config
+        count = config.get(option, default)
+        if not isinstance(count, int) or isinstance(count, bool) or count < minimum:
+            msg = '{} of workload {} must be a number >= {}'
+            raise ScottyException(msg.format(option, self.name, minimum))
+        return count
+
+    def iter_matrix(self):
+        """Yield the param tuples of the matrix, ((name, value), ...) sorted by name"""
+        names = sorted(self.matrix)
+        for values in itertools.product(*[self.matrix[name] for name in names]):
+            yield tuple(zip(names, values))
+
+
+class WorkloadInstance(Workload):
+    """Single run of a workload with its own params.
+
+    The instance shares config, workspace and module with the workload and
+    is seen as the workload in the context.
+    """
+
+    def __init__(self, workload, params=None, key=None):
+        super(WorkloadInstance, self).__init__()
+        self.workload = workload
+        self.key = key
+        self.config = dict(workload.config)
+        self.config['params'] = dict(workload.config.get('params') or {}, **(params or {}))
+        self.workspace = workload.workspace
+        self.base_path = workload.base_path
+        self.coroutine_interfaces = workload.coroutine_interfaces
+
+    @property
+    def type(self):
+        return 'workload'
+
+    @property
+    def module(self):
+        return self.workload.module
+
+    @property
+    def module_loaded(self):
+        return self.workload.module_loaded
+
+    def unload_module(self):
+        pass
+
 
 class Experiment(Component):
     def __init__(self):
         super(Experiment, self).__init__()
         self.components = defaultdict(dict)
+        self.sources = {}
         self.state = CommonComponentState.PREPARE
         
     def add_component(self, component):
@@ -151,7 +419,6 @@ class Resource(Component):
     ]
     def __init__(self):
         super(Resource, self).__init__()
-        self.module = None
         self.parent_module_name = 'scotty.resource'
         self.state = CommonComponentState.PREPARE
         self.endpoint = None
@@ -174,7 +441,6 @@ class SystemCollector(Component):
 
     def __init__(self):
         super(SystemCollector, self).__init__()
-        self.module = None
         self.parent_module_name = 'scotty.systemcollector'
         self.state = CommonComponentState.PREPARE
         self.result = None
@@ -192,7 +458,6 @@ class ResultStore(Component):
 
     def __init__(self):
         super(ResultStore, self).__init__()
-        self.module = None
         self.parent_module_name = 'scotty.resultstore'
         self.state = CommonComponentState.PREPARE
         self._setaccess('params')
@@ -207,23 +472,131 @@ class ResultStore(Component):
 
 
 class ComponentValidator(object):
+    executors = ['thread', 'process']
+
+    @classmethod
+    def validate_executor(cls, component):
+        if component.executor not in cls.executors:
+            err_msg = 'Unsupported executor {} for {} {}, use "thread" or "process"'.format(
+                component.executor,
+                component.type,
+                component.name)
+            raise ScottyException(err_msg)
+
     @classmethod
     def validate_interfaces(cls, component):
+        """Validate the module interfaces of the component from the source.
+
+        The module is not imported. Interfaces decorated as coroutine or
+        assigned from a coroutine call are recorded in
+        component.coroutine_interfaces.
+        """
+        functions, star_import = cls._get_module_functions(component)
         for interface_ in component.module_interfaces:
-            cls.validate_interface(component, interface_)
+            if interface_ in functions:
+                if functions[interface_]:
+                    component.coroutine_interfaces.add(interface_)
+            elif not star_import:
+                cls._raise_missing_interface(component, interface_)
 
     @classmethod
     def validate_interface(cls, component, interface_):
+        functions, star_import = cls._get_module_functions(component)
+        if interface_ not in functions and not star_import:
+            cls._raise_missing_interface(component, interface_)
+
+    @classmethod
+    def _raise_missing_interface(cls, component, interface_):
+        err_msg = 'Missing interface {} for {} {}.'.format(
+            interface_,
+            component.type,
+            component.name)
+        raise ScottyException(err_msg)
+
+    @classmethod
+    def validate_run_plan(cls, workload):
+        cls.validate_matrix(workload)
+        # raise a ScottyException for invalid values
+        workload.repetitions
+        workload.warmup
+        workload.confidence
+        workload.convergence
+        workload.search
+        workload.replicas
+        workload.reducer
+
+    @classmethod
+    def validate_reducer(cls, workload):
+        for reducer in Reducer.get_custom_reducers(workload.reducer):
+            cls.validate_interface(workload, reducer)
+
+    @classmethod
+    def validate_matrix(cls, workload):
+        if not isinstance(workload.matrix, dict):
+            msg = 'matrix of workload {} must map params to lists of values'
+            raise ScottyException(msg.format(workload.name))
+        for name, values in workload.matrix.iteritems():
+            if not isinstance(values, list) or not values:
+                msg = 'matrix param {} of workload {} must be a non-empty list'
+                raise ScottyException(msg.format(name, workload.name))
+            for value in values:
+                if isinstance(value, (list, dict)):
+                    msg = 'matrix param {} of workload {} must have scalar values'
+                    raise ScottyException(msg.format(name, workload.name))
+        # raises a ScottyException for an invalid matrix_concurrency
+        workload.matrix_concurrency
+
+    @classmethod
+    def _get_module_functions(cls, component):
         try:
-            getattr(component.module, interface_)
-        except:
-            err_msg = 'Missing interface {} for {} {}.'.format(
-                interface_,
+            with open(component.module_path, 'rU') as source_file:
+                tree = ast.parse(source_file.read(), component.module_path)
+        except (IOError, SyntaxError) as error:
+            err_msg = 'Invalid module for {} {}: {}'.format(
                 component.type,
-                component.name)
+                component.name,
+                error)
             raise ScottyException(err_msg)
+        functions = {}
+        star_import = False
+        nodes = list(tree.body)
+        while nodes:
+            node = nodes.pop(0)
+            if isinstance(node, ast.FunctionDef):
+                functions[node.name] = any(
+                    cls._is_coroutine_decorator(decorator)
+                    for decorator in node.decorator_list)
+            elif isinstance(node, ast.Assign):
+                # run = coroutine(_run)
+                is_coroutine = (isinstance(node.value, ast.Call) and
+                                cls._is_coroutine_decorator(node.value.func))
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        functions[target.id] = functions.get(target.id) or is_coroutine
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name == '*':
+                        star_import = True
+                    else:
+                        functions.setdefault(alias.asname or alias.name, False)
+            elif isinstance(node, (ast.If, ast.TryExcept, ast.TryFinally, ast.With)):
+                for field in ['body', 'orelse', 'handlers', 'finalbody']:
+                    nodes.extend(getattr(node, field, None) or [])
+            elif isinstance(node, ast.ExceptHandler):
+                nodes.extend(node.body)
+        return functions, star_import
+
+    @classmethod
+    def _is_coroutine_decorator(cls, decorator):
+        if isinstance(decorator, ast.Name):
+            return decorator.id == 'coroutine'
+        if isinstance(decorator, ast.Attribute):
+            return decorator.attr == 'coroutine'
+        return False
 
 class ComponentFactory(object):
+    _sources_lock = threading.Lock()
+
     @classmethod
     def _get_component_workspace(cls, experiment, component):
         workspace_path = experiment.workspace.get_component_path(component)
@@ -231,13 +604,53 @@ class ComponentFactory(object):
         return workspace
 
     @classmethod
-    def _get_component_module(cls, experiment, component):
-        CheckoutManager.populate(component, experiment.workspace.path)
-        module_ =  ModuleLoader.load_by_component(component)
-        return module_
+    def _get_component_base_path(cls, experiment):
+        return experiment.workspace.path
+
+    @classmethod
+    def _populate_component(cls, experiment, component):
+        ComponentValidator.validate_executor(component)
+        source_workspace = cls._get_component_source(experiment, component)
+        FileSync.sync(
+            source_workspace.path,
+            component.workspace.path,
+            link='hardlink',
+            ignore=('.scotty', '.git'))
+        ComponentValidator.validate_interfaces(component)
+
+    @classmethod
+    def _get_component_source(cls, experiment, component):
+        """Populate the source of the component once per experiment.
+
+        Components with the same generator share the populated source in
+        .scotty/sources. The source is added to the component store and
+        removed afterwards, so store GC limits all copies of it. The
+        component workspaces are hard linked views on the store entry and
+        therefore read-only.
+        """
+        with cls._sources_lock:
+            source_future = experiment.sources.get(component.source_key)
+            is_owner = source_future is None
+            if is_owner:
+                source_future = futures.Future()
+                experiment.sources[component.source_key] = source_future
+        if not is_owner:
+            return source_future.result()
+        try:
+            source_path = experiment.workspace.get_source_path(component)
+            source_workspace = Workspace.factory(component, source_path)
+            CheckoutManager.populate(component, experiment.workspace.path, source_workspace)
+            entry_path = ComponentStore.add(experiment.workspace.store_path, source_path)
+            shutil.rmtree(source_path, ignore_errors=True)
+            ComponentStore.compile(entry_path)
+            entry_workspace = Workspace.factory(component, entry_path)
+        except Exception as exception:
+            source_future.set_exception(exception)
+            raise
+        source_future.set_result(entry_workspace)
+        return entry_workspace
 
 class ExperimentFactory(ComponentFactory):
-    yaml_pattern_env = re.compile(r'\<%=\s*ENV\[\'([^\]\s]+)\'\]\s*%\>')
     @classmethod
     def build(cls, options):
         experiment = Experiment()
@@ -256,17 +669,8 @@ class ExperimentFactory(ComponentFactory):
 
     @classmethod
     def _get_experiment_config(cls, experiment):
-         with open(experiment.workspace.config_path, 'r') as stream:
-             yaml.add_implicit_resolver ( "!scotty_yaml_env", cls.yaml_pattern_env )
-             yaml.add_constructor('!scotty_yaml_env', cls._scotty_yaml_env_constructor)
-             config = yaml.load(stream)
-         return config
+        return ConfigLoader.load(experiment.workspace.config_path)
 
-    @classmethod
-    def _scotty_yaml_env_constructor(cls, loader, node):
-        value = loader.construct_scalar(node)
-        env_var = cls.yaml_pattern_env.match(value).groups()[0]
-        return os.environ.get(env_var, '')
 
 class ResourceFactory(ComponentFactory):
     @classmethod
@@ -274,7 +678,8 @@ class ResourceFactory(ComponentFactory):
         resource = Resource()
         resource.config = resource_config
         resource.workspace = cls._get_component_workspace(experiment, resource)
-        resource.module = cls._get_component_module(experiment, resource)
+        resource.base_path = cls._get_component_base_path(experiment)
+        cls._populate_component(experiment, resource)
         return resource
 
 class SystemCollectorFactory(ComponentFactory):
@@ -283,7 +688,8 @@ class SystemCollectorFactory(ComponentFactory):
         systemcollector = SystemCollector()
         systemcollector.config = systemcollector_config
         systemcollector.workspace = cls._get_component_workspace(experiment, systemcollector)
-        systemcollector.module = cls._get_component_module(experiment, systemcollector)
+        systemcollector.base_path = cls._get_component_base_path(experiment)
+        cls._populate_component(experiment, systemcollector)
         return systemcollector
 
 class WorkloadFactory(ComponentFactory):
@@ -292,7 +698,10 @@ class WorkloadFactory(ComponentFactory):
         workload = Workload()
         workload.config = workload_config
         workload.workspace = cls._get_component_workspace(experiment, workload)
-        workload.module = cls._get_component_module(experiment, workload)
+        workload.base_path = cls._get_component_base_path(experiment)
+        ComponentValidator.validate_run_plan(workload)
+        cls._populate_component(experiment, workload)
+        ComponentValidator.validate_reducer(workload)
         return workload
 
 class ResultStoreFactory(ComponentFactory):
@@ -301,5 +710,6 @@ class ResultStoreFactory(ComponentFactory):
         resultstore = ResultStore()
         resultstore.config = resultstore_config
         resultstore.workspace = cls._get_component_workspace(experiment, resultstore)
-        resultstore.module = cls._get_component_module(experiment, resultstore)
+        resultstore.base_path = cls._get_component_base_path(experiment)
+        cls._populate_component(experiment, resultstore)
         return resultstore
@@ -0,0 +1,84 @@
+import cPickle
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigLoader(object):
+    """Load experiment configs with expansion of <%= ENV['name'] %>.
+
+    The config is parsed with the LibYAML based CSafeLoader if available.
+    The env expansion is registered on a dedicated loader class, so the
+    global resolvers of PyYAML stay untouched. Parsed configs are cached by
+    path, mtime, size and the values of the env variables they reference.
+    """
+    pattern_env = re.compile(r'\<%=\s*ENV\[\'([^\]\s]+)\'\]\s*%\>')
+    env_tag = '!scotty_yaml_env'
+    _loader_class = None
+    _cache = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        file_key = (stat.st_mtime, stat.st_size, stat.st_ino)
+        with cls._lock:
+            entry = cls._cache.get(path)
+        if entry and entry['file_key'] == file_key and cls._is_env_unchanged(entry['env']):
+            return cPickle.loads(entry['config'])
+        config, env_names = cls._parse(path)
+        env = dict((name, os.environ.get(name, '')) for name in env_names)
+        with cls._lock:
+            cls._cache[path] = {
+                'file_key': file_key,
+                'env': env,
+                'config': cPickle.dumps(config, cPickle.HIGHEST_PROTOCOL),
+            }
+        return config
+
+    @classmethod
+    def _is_env_unchanged(cls, env):
+        return all(os.environ.get(name, '') == value for name, value in env.iteritems())
+
+    @classmethod
+    def _parse(cls, path):
+        loader_class = cls._get_loader_class()
+        with open(path, 'r') as stream:
+            loader = loader_class(stream)
+            try:
+                config = loader.get_single_data()
+            finally:
+                loader.dispose()
+        return config, loader.env_names
+
+    @classmethod
+    def _get_loader_class(cls):
+        if cls._loader_class is None:
+            import yaml
+            loader_base = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+            class Loader(loader_base):
+                def __init__(self, stream):
+                    loader_base.__init__(self, stream)
+                    self.env_names = set()
+
+            Loader.add_implicit_resolver(cls.env_tag, cls.pattern_env, ['<'])
+            Loader.add_constructor(cls.env_tag, cls._construct_env)
+            cls._loader_class = Loader
+        return cls._loader_class
+
+    @classmethod
+    def _construct_env(cls, loader, node):
+        value = loader.construct_scalar(node)
+        env_var = cls.pattern_env.match(value).groups()[0]
+        loader.env_names.add(env_var)
+        return os.environ.get(env_var, '')
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
@@ -1,4 +1,5 @@
 import logging
+from collections import defaultdict
 
 from scotty.core.exceptions import ScottyException
 
@@ -39,11 +40,12 @@ class ContextV1(Context):
         self._context = {}
         self._context[component.type] = ContextComponent(component)
         self.__experiment = experiment
+        self.__base_path = component.base_path
 
 
 class ContextComponent(Context):
     def __init__(self, component):
-        self.__context_accessible = ContextAccessible(component.__class__.__name__)
+        self.__context_accessible = ContextAccessible(component.type)
         self.__component = component
 
     def __getattr__(self, name):
@@ -51,3 +53,48 @@ class ContextComponent(Context):
             return getattr(self.__component, name)
         else:
             raise ScottyException('{} not found'.format(name))
+
+
+class ComponentSnapshot(object):
+    """Picklable copy of the context accessible attributes of a component.
+
+    Used as component for the context of components which are executed in a
+    worker process.
+    """
+
+    def __init__(self, component):
+        self.type = component.type
+        self.module_path = getattr(component, 'module_path', None)
+        self.parent_module_name = getattr(component, 'parent_module_name', None)
+        self.state = getattr(component, 'state', None)
+        self._accessibles = []
+        component_accessible = ContextAccessible(component.type).component_accessible
+        for name in component_accessible:
+            try:
+                value = getattr(component, name)
+            except Exception:
+                continue
+            setattr(self, name, value)
+            self._accessibles.append(name)
+
+    def setaccess(self):
+        context_accessible = ContextAccessible(self.type)
+        for name in self._accessibles:
+            context_accessible.setaccess(name)
+
+
+class ExperimentSnapshot(object):
+    """Picklable copy of an experiment with snapshots of all its components"""
+
+    def __init__(self, experiment):
+        self.uuid = experiment.uuid
+        self.starttime = experiment.starttime
+        self.components = defaultdict(dict)
+        for component_type, components in experiment.components.iteritems():
+            for name, component in components.iteritems():
+                self.components[component_type][name] = ComponentSnapshot(component)
+
+    def setaccess(self):
+        for components in self.components.itervalues():
+            for component in components.itervalues():
+                component.setaccess()
@@ -1,44 +1,418 @@
+import inspect
 import logging
+import multiprocessing
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
 
 from concurrent import futures
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
 
 #from concurrent.futures import ThreadPoolExecutor, as_completed
 #from concurrent.futures import wait as futures_wait
 
+from scotty.config import ScottyConfig
 from scotty.core.components import CommonComponentState
+from scotty.core.components import WorkloadInstance
 from scotty.core.exceptions import ScottyException
+from scotty.core.statistics import Statistics
 from scotty.core.context import Context
+from scotty.core.context import ComponentSnapshot
+from scotty.core.context import ExperimentSnapshot
+from scotty.core.moduleloader import ModuleLoader
+from scotty.core.reducer import Reducer
 
 logger = logging.getLogger(__name__)
 
 
-class ComponentExecutor(futures.ThreadPoolExecutor):
+def _get_resource_names(workload):
+    resources = workload.config.get('resources') or {}
+    return set(resources.values())
+
+
+def _when_done(futures_, function_, *args):
+    """Call function_(*args) once all futures_ are done"""
+    pending = set(futures_)
+    if not pending:
+        function_(*args)
+        return
+    lock = threading.Lock()
+
+    def future_done(future):
+        with lock:
+            pending.discard(future)
+            if pending:
+                return
+        function_(*args)
+
+    for future in set(futures_):
+        future.add_done_callback(future_done)
+
+
+def _is_coroutine_function(function_):
+    if asyncio is None:
+        return False
+    if not (inspect.isfunction(function_) or inspect.ismethod(function_)):
+        return False
+    return asyncio.iscoroutinefunction(function_)
+
+
+def _run_coroutine(function_, context):
+    """Run a coroutine function to completion on a new event loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(function_(context))
+    finally:
+        loop.close()
+
+
+def _exec_in_process(component, experiment, interface_):
+    """Execute the interface of a component snapshot inside a worker process"""
+    experiment.setaccess()
+    component.setaccess()
+    report = {'result': None, 'starttime': None, 'endtime': None}
+    module_ = None
+    try:
+        module_ = ModuleLoader.load_by_path(
+            component.module_path,
+            component.name,
+            component.parent_module_name)
+        function_ = getattr(module_, interface_)
+        context = Context(component, experiment)
+        report['starttime'] = datetime.now()
+        if _is_coroutine_function(function_):
+            report['result'] = _run_coroutine(function_, context)
+        else:
+            report['result'] = function_(context)
+        report['endtime'] = datetime.now()
+        report['state'] = CommonComponentState.COMPLETED
+    except:
+        report['state'] = CommonComponentState.ERROR
+        msg = 'Error from customer {}.{}'.format(component.type, component.name)
+        logger.exception(msg)
+    finally:
+        ModuleLoader.unload(module_)
+    return report
+
+
+class EventLoop(object):
+    """Shared asyncio event loop running in a daemon thread.
+
+    Coroutine interfaces (async def run(context), ...) of all executors are
+    driven on this loop instead of blocking one executor thread each.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
     def __init__(self):
-        super(ComponentExecutor, self).__init__(4)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='scotty-event-loop')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call_soon_threadsafe(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+class ConcurrencyLimits(object):
+    """Number of worker threads per phase and deploy limits per resource type.
+
+    The limits are looked up in the 'concurrency' section of experiment.yaml
+    and afterwards in the [concurrency] section of scotty.conf. A limit for
+    '<component type>.<phase>' (e.g. 'workload.clean') has precedence over a
+    limit for the phase. The value 'unbounded' starts a thread for each
+    component.
+    """
+    default_max_workers = 4
+
+    def __init__(self, experiment=None):
+        self._scotty_config = ScottyConfig()
+        self._experiment_limits = {}
+        if experiment is not None and experiment.config:
+            self._experiment_limits = experiment.config.get('concurrency') or {}
+        self._resource_type_limits = self._experiment_limits.get('resource_types') or {}
+        self._semaphores = {}
+        # only used on the event loop thread
+        self._async_semaphores = {}
+        self._lock = threading.Lock()
+        self._process_pool = None
+
+    def get_max_workers(self, component_type=None, phase=None):
+        keys = ['{}.{}'.format(component_type, phase), phase]
+        for key in keys:
+            if key in self._experiment_limits:
+                return self._parse_limit(key, self._experiment_limits[key])
+        for key in keys:
+            if key and self._scotty_config.has_option('concurrency', key):
+                limit = self._scotty_config.get('concurrency', key)
+                return self._parse_limit(key, limit)
+        return self.default_max_workers
+
+    def _parse_limit(self, key, limit):
+        if str(limit).strip().lower() == 'unbounded':
+            return sys.maxsize
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            msg = 'Concurrency for {} must be a positive number or "unbounded"'
+            raise ScottyException(msg.format(key))
+        return limit
+
+    def get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                processes = self._experiment_limits.get('processes', multiprocessing.cpu_count())
+                if str(processes).strip().lower() == 'unbounded':
+                    msg = 'Concurrency for processes must be a positive number, not "unbounded"'
+                    raise ScottyException(msg)
+                processes = self._parse_limit('processes', processes)
+                self._process_pool = futures.ProcessPoolExecutor(processes)
+                # fork all worker processes now, before the component threads are running
+                self._process_pool.submit(int).result()
+            return self._process_pool
+
+    def shutdown(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+
+    @contextmanager
+    def limit(self, component):
+        semaphore = self._get_semaphore(component)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    def _get_semaphore(self, component):
+        resource_type = self._get_limited_resource_type(component)
+        if resource_type is None:
+            return None
+        with self._lock:
+            if resource_type not in self._semaphores:
+                limit = self._parse_limit(resource_type, self._resource_type_limits[resource_type])
+                self._semaphores[resource_type] = threading.BoundedSemaphore(limit)
+            return self._semaphores[resource_type]
+
+    def get_async_semaphore(self, component, loop):
+        """Semaphore on the event loop for the limit of the resource type of component.
+
+        Coroutine interfaces run on the event loop and can not block on the
+        threading semaphore of limit(). Must be called on the loop thread.
+        """
+        resource_type = self._get_limited_resource_type(component)
+        if resource_type is None:
+            return None
+        if resource_type not in self._async_semaphores:
+            limit = self._parse_limit(resource_type, self._resource_type_limits[resource_type])
+            self._async_semaphores[resource_type] = asyncio.Semaphore(limit, loop=loop)
+        return self._async_semaphores[resource_type]
+
+    def _get_limited_resource_type(self, component):
+        if component.type != 'resource':
+            return None
+        resource_type = component.config.get('type', component.config['generator'])
+        if resource_type not in self._resource_type_limits:
+            return None
+        return resource_type
+
+
+class ComponentExecutor(futures.ThreadPoolExecutor):
+    component_type = None
+    phase = None
+
+    def __init__(self, concurrency=None):
+        self._concurrency = concurrency or ConcurrencyLimits()
+        max_workers = self._concurrency.get_max_workers(self.component_type, self.phase)
+        super(ComponentExecutor, self).__init__(max_workers)
         self._future_to_component = {}
+        # limits the running coroutine interfaces like the worker threads
+        self._async_semaphore = None
 
     def submit(self, experiment, component, interface_):
-        future = super(ComponentExecutor, self).submit(
-            self._exec_with_context, 
-            experiment, 
-            component, 
-            interface_)
+        function_ = self._get_coroutine_function(component, interface_)
+        if function_ is not None:
+            future = self._submit_coroutine(experiment, component, interface_, function_)
+        else:
+            future = super(ComponentExecutor, self).submit(
+                self._exec_with_context,
+                experiment,
+                component,
+                interface_)
         self._future_to_component[future] = component
+        return future
 
-    def _exec_with_context(self, experiment, component, interface_):
+    def _is_coroutine_interface(self, component, interface_):
+        """Whether the interface may be a coroutine, without importing the module"""
+        if asyncio is None or getattr(component, 'executor', None) != 'thread':
+            return False
+        if not getattr(component, 'module_loaded', True):
+            return interface_ in component.coroutine_interfaces
+        function_ = getattr(getattr(component, 'module', None), interface_, None)
+        return _is_coroutine_function(function_)
+
+    def _get_coroutine_function(self, component, interface_):
+        # the module is imported in the submitting thread, never on the event loop
+        if not self._is_coroutine_interface(component, interface_):
+            return None
+        try:
+            function_ = self._get_function(component, interface_)
+        except:
+            # the executor thread logs the error
+            return None
+        if not _is_coroutine_function(function_):
+            return None
+        return function_
+
+    def _submit_coroutine(self, experiment, component, interface_, function_):
+        future = futures.Future()
+        event_loop = EventLoop.get()
+        event_loop.call_soon_threadsafe(
+            self._start_coroutine,
+            event_loop.loop,
+            experiment,
+            component,
+            interface_,
+            function_,
+            future)
+        return future
+
+    def _start_coroutine(self, loop, experiment, component, interface_, function_, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        semaphores = self._get_async_semaphores(loop, component)
+        self._acquire_async(
+            loop,
+            semaphores,
+            self._create_task,
+            loop, experiment, component, interface_, function_, future, semaphores)
+
+    def _get_async_semaphores(self, loop, component):
+        # always acquired in this order, the phase limit before the resource type limit
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self._max_workers, loop=loop)
+        semaphores = [self._async_semaphore]
+        semaphore = self._concurrency.get_async_semaphore(component, loop)
+        if semaphore is not None:
+            semaphores.append(semaphore)
+        return semaphores
+
+    def _acquire_async(self, loop, semaphores, callback, *args):
+        """Call callback(*args) on the event loop once all semaphores are acquired"""
+        if not semaphores:
+            callback(*args)
+            return
+        task = loop.create_task(semaphores[0].acquire())
+        task.add_done_callback(
+            lambda task: self._acquire_async(loop, semaphores[1:], callback, *args))
+
+    def _create_task(self, loop, experiment, component, interface_, function_, future, semaphores):
         logger.info('Execute {} {} for {}'.format(component.type, interface_, component.name))
-        with experiment.workspace.cwd():
+        try:
             context = Context(component, experiment)
+            component.state = CommonComponentState.ACTIVE
+            component.starttime = datetime.now()
+            task = loop.create_task(function_(context))
+        except Exception as exception:
+            self._release_async(semaphores)
+            self._log_component_exception(component)
+            experiment.state = CommonComponentState.ERROR
+            future.set_exception(exception)
+            return
+        task.add_done_callback(
+            lambda task: self._finish_coroutine(experiment, component, task, future, semaphores))
+
+    def _release_async(self, semaphores):
+        for semaphore in reversed(semaphores):
+            semaphore.release()
+
+    def _finish_coroutine(self, experiment, component, task, future, semaphores):
+        self._release_async(semaphores)
+        result = None
+        try:
+            result = task.result()
+            component.endtime = datetime.now()
+            component.state = CommonComponentState.COMPLETED
+        except:
+            self._log_component_exception(component)
+            experiment.state = CommonComponentState.ERROR
+        self._store_result(component, result)
+        future.set_result(result)
+
+    def _exec_with_context(self, experiment, component, interface_):
+        logger.info('Execute {} {} for {}'.format(component.type, interface_, component.name))
+        with self._concurrency.limit(component):
+            if component.executor == 'process':
+                result = self._exec_process(experiment, component, interface_)
+            else:
+                context = Context(component, experiment)
+                result = self._exec_interface(component, interface_, context)
+        if component.state == CommonComponentState.ERROR:
+            experiment.state = CommonComponentState.ERROR
+        self._store_result(component, result)
+        return result
+
+    def _store_result(self, component, result):
+        """Keep the result at the component before its future is done.
+
+        Waiters and done callbacks of the future can see the result then.
+        """
+        pass
+
+    def _exec_process(self, experiment, component, interface_):
+        process_pool = self._concurrency.get_process_pool()
+        component.state = CommonComponentState.ACTIVE
+        try:
+            future = process_pool.submit(
+                _exec_in_process,
+                ComponentSnapshot(component),
+                ExperimentSnapshot(experiment),
+                interface_)
+            report = future.result()
+        except:
+            self._log_component_exception(component)
+            return None
+        component.starttime = report['starttime']
+        component.endtime = report['endtime']
+        component.state = report['state']
+        return report['result']
+
+    def _exec_interface(self, component, interface_, context):
+        try:
             function_ = self._get_function(component, interface_)
-            result = self._exec_function(component, function_, context)
-            if component.state == CommonComponentState.ERROR:
-                experiment.state = CommonComponentState.ERROR
-            return result
+        except:
+            self._log_component_exception(component)
+            return None
+        return self._exec_function(component, function_, context)
 
     def _get_function(self, component, interface_):
+        module_ = component.module
         try:
-            function_ = getattr(component.module, interface_)
+            function_ = getattr(module_, interface_)
             return function_
         except:
             msg = 'Missing interface {} {}.{}'.format(component.type, component.name, interface_)
@@ -48,7 +422,11 @@ class ComponentExecutor(futures.ThreadPoolExecutor):
         try:
             component.state = CommonComponentState.ACTIVE
             component.starttime = datetime.now()
-            result = function_(context)
+            if _is_coroutine_function(function_):
+                # not recognized as coroutine from the source, e.g. run = coroutine(_run)
+                result = _run_coroutine(function_, context)
+            else:
+                result = function_(context)
             component.endtime = datetime.now()
             component.state = CommonComponentState.COMPLETED
             return result
@@ -68,59 +446,524 @@ class ComponentExecutor(futures.ThreadPoolExecutor):
 
 
 class WorkloadRunExecutor(ComponentExecutor):
-    def submit_workloads(self, experiment):
+    component_type = 'workload'
+    phase = 'run'
+
+    def __init__(self, concurrency=None, resource_release_executor=None):
+        super(WorkloadRunExecutor, self).__init__(concurrency)
+        self._resource_release_executor = resource_release_executor
+        self._lock = threading.Lock()
+        self._unsubmitted = 0
+        self._all_submitted = threading.Event()
+        self._workload_futures = {}
+        self._released = 0
+        self._released_condition = threading.Condition()
+        # drives the runs of matrix workloads, separate from the run threads
+        self._driver_executor = futures.ThreadPoolExecutor(sys.maxsize)
+
+    def submit_workloads(self, experiment, resource_deploy_executor=None,
+                         systemcollector_collect_executor=None):
+        """Submit each workload once its resources are deployed and the
+        systemcollectors have collected.
+        """
         workloads = experiment.components['workload']
+        self._unsubmitted = len(workloads)
+        if not self._unsubmitted:
+            self._all_submitted.set()
         for workload in workloads.itervalues():
-            logger.info('Submit workload {}.run(context)'.format(workload.name))
-            self.submit(experiment, workload, 'run')
+            wait_futures = self._get_deploy_futures(workload, resource_deploy_executor)
+            if systemcollector_collect_executor is not None:
+                wait_futures.append(systemcollector_collect_executor.get_future())
+            _when_done(wait_futures, self._submit_workload, experiment, workload)
+
+    def _get_deploy_futures(self, workload, resource_deploy_executor):
+        if resource_deploy_executor is None:
+            return []
+        deploy_futures = []
+        for resource_name in _get_resource_names(workload):
+            future = resource_deploy_executor.get_future(resource_name)
+            if future is None:
+                msg = 'Workload {} references unknown resource {}'
+                logger.warning(msg.format(workload.name, resource_name))
+            else:
+                deploy_futures.append(future)
+        return deploy_futures
+
+    def _submit_workload(self, experiment, workload):
+        logger.info('Submit workload {}.run(context)'.format(workload.name))
+        with self._lock:
+            if workload.planned:
+                future = self._driver_executor.submit(self._run_plan, experiment, workload)
+                self._future_to_component[future] = workload
+            else:
+                future = self.submit(experiment, workload, 'run')
+            self._workload_futures[future] = workload
+            if self._resource_release_executor is not None:
+                future.add_done_callback(self._release_workload)
+            self._unsubmitted -= 1
+            if not self._unsubmitted:
+                self._all_submitted.set()
+
+    def _run_plan(self, experiment, workload):
+        """Run the workload once per param tuple of its matrix.
+
+        The param tuples are expanded lazily and at most matrix_concurrency
+        of them run at the same time. Returns the results keyed by param
+        tuple, or the result of the single param tuple () without matrix.
+        """
+        if workload.search:
+            return self._run_search(experiment, workload)
+        workload.state = CommonComponentState.ACTIVE
+        workload.starttime = datetime.now()
+        if workload.matrix:
+            keys = workload.iter_matrix()
+            running = threading.BoundedSemaphore(workload.matrix_concurrency)
+        else:
+            keys = [()]
+            running = threading.BoundedSemaphore(1)
+        run_futures = OrderedDict()
+        for key in keys:
+            running.acquire()
+            future = self._driver_executor.submit(self._run_point, experiment, workload, key)
+            future.add_done_callback(lambda future: running.release())
+            run_futures[key] = future
+        futures.wait(run_futures.values())
+        workload.endtime = datetime.now()
+        workload.runs = OrderedDict()
+        results = OrderedDict()
+        workload.state = CommonComponentState.COMPLETED
+        for key, future in run_futures.iteritems():
+            run = future.result()
+            if run['state'] == CommonComponentState.ERROR:
+                workload.state = CommonComponentState.ERROR
+            workload.runs[key] = run
+            results[key] = run['result']
+        if not workload.matrix:
+            return results[()]
+        return results
+
+    def _run_search(self, experiment, workload):
+        """Search the highest param value whose metric meets the slo.
+
+        The value grows by factor from start until a probe fails the slo
+        and is then bisected between the last passed and the first failed
+        probe. The resources stay deployed for all probes. Returns the knee
+        point with the history of the probes.
+        """
+        search = workload.search
+        workload.state = CommonComponentState.ACTIVE
+        workload.starttime = datetime.now()
+        workload.runs = OrderedDict()
+        probes = []
+        passed, failed = None, None
+        value = search['start']
+        stop_reason = 'max_probes'
+        while len(probes) < search['max_probes']:
+            if self._probe(experiment, workload, value, probes):
+                passed = value
+                if search['max'] is not None and value >= search['max']:
+                    stop_reason = 'max_reached'
+                    break
+                value = value * search['factor']
+                if search['max'] is not None:
+                    value = min(value, search['max'])
+            else:
+                failed = value
+                break
+        if failed is not None and passed is None:
+            stop_reason = 'start_failed'
+        elif failed is not None:
+            while len(probes) < search['max_probes']:
+                if failed - passed <= search['resolution']:
+                    stop_reason = 'resolution_reached'
+                    break
+                value = (passed + failed) / 2.0
+                if search['integer']:
+                    value = int(value)
+                    if value == passed:
+                        stop_reason = 'resolution_reached'
+                        break
+                if self._probe(experiment, workload, value, probes):
+                    passed = value
+                else:
+                    failed = value
+        workload.endtime = datetime.now()
+        workload.state = CommonComponentState.COMPLETED
+        if probes[0]['state'] == CommonComponentState.ERROR:
+            workload.state = CommonComponentState.ERROR
+        msg = 'Workload {} search of {} stopped ({}) with knee point {}'
+        logger.info(msg.format(workload.name, search['param'], stop_reason, passed))
+        return {
+            'param': search['param'],
+            'metric': search['metric'],
+            'slo': search['slo'],
+            'knee': passed,
+            'limit': failed,
+            'stop_reason': stop_reason,
+            'probes': probes,
+        }
+
+    def _probe(self, experiment, workload, value, probes):
+        search = workload.search
+        key = ((search['param'], value),)
+        run = self._run_point(experiment, workload, key)
+        workload.runs[key] = run
+        completed = [sample for sample in run['samples']
+                     if sample['state'] == CommonComponentState.COMPLETED]
+        values = Statistics.metric_values(completed, search['metric'])
+        metric_value = None
+        if completed and values is not None:
+            metric_value = float(values.mean())
+        passed = (run['state'] == CommonComponentState.COMPLETED and
+                  metric_value is not None and metric_value <= search['slo'])
+        probes.append({
+            'value': value,
+            'metric_value': metric_value,
+            'passed': passed,
+            'state': run['state'],
+        })
+        msg = 'Workload {} probe {}={}: {}={} ({})'
+        logger.info(msg.format(workload.name, search['param'], value, search['metric'],
+                               metric_value, 'passed' if passed else 'failed'))
+        return passed
+
+    def _run_point(self, experiment, workload, key):
+        """Run the warmup and the repetitions of one param tuple back to back"""
+        if key:
+            logger.info('Run workload {} with {}'.format(workload.name, dict(key)))
+        for repetition in range(workload.warmup):
+            self._run_instance(experiment, workload, key, repetition, True)
+        samples = []
+        if workload.convergence:
+            stop_reason = self._run_until_converged(experiment, workload, key, samples)
+        else:
+            for repetition in range(workload.repetitions):
+                samples.append(self._run_instance(experiment, workload, key, repetition))
+            stop_reason = 'repetitions'
+        run = self._get_run(workload, key, samples)
+        run['stop_reason'] = stop_reason
+        if workload.convergence:
+            msg = 'Workload {} stopped after {} repetitions: {}'
+            logger.info(msg.format(workload.name, len(samples), stop_reason))
+            values = Statistics.metric_values(run['samples'], workload.convergence['metric'])
+            run['relative_error'] = None
+            if values is not None:
+                run['relative_error'] = Statistics.relative_error(values, workload.confidence)
+        return run
+
+    def _run_until_converged(self, experiment, workload, key, samples):
+        """Repeat the run until the confidence interval of the metric is narrow enough.
+
+        Stops as well on the first failed run, on a sample without the
+        metric and when max_repetitions or max_time is reached. Returns the
+        reason of the stop.
+        """
+        convergence = workload.convergence
+        starttime = time.time()
+        while True:
+            sample = self._run_instance(experiment, workload, key, len(samples))
+            samples.append(sample)
+            if sample['state'] != CommonComponentState.COMPLETED:
+                return 'error'
+            values = Statistics.metric_values(samples, convergence['metric'])
+            if values is None:
+                msg = 'Workload {} has no numeric value for convergence metric {}'
+                logger.error(msg.format(workload.name, convergence['metric']))
+                return 'invalid_metric'
+            if len(samples) >= convergence['min_repetitions']:
+                relative_error = Statistics.relative_error(values, workload.confidence)
+                if relative_error <= convergence['relative_error']:
+                    return 'converged'
+            if convergence['max_repetitions'] and len(samples) >= convergence['max_repetitions']:
+                return 'max_repetitions'
+            if convergence['max_time'] and time.time() - starttime >= convergence['max_time']:
+                return 'max_time'
+
+    def _run_instance(self, experiment, workload, key, repetition, warmup_run=False):
+        """Run the replicas of the workload concurrently and reduce their results"""
+        instances = []
+        for replica in range(workload.replicas):
+            instance = WorkloadInstance(workload, dict(key), key)
+            instance.repetition = repetition
+            instance.warmup_run = warmup_run
+            instance.replica = replica
+            instances.append(instance)
+        instance_futures = [self._submit_instance(experiment, instance, len(instances))
+                            for instance in instances]
+        for instance, future in zip(instances, instance_futures):
+            instance.result = future.result()
+        if len(instances) == 1:
+            instance = instances[0]
+            duration = None
+            if instance.state == CommonComponentState.COMPLETED:
+                duration = (instance.endtime - instance.starttime).total_seconds()
+            return {
+                'result': instance.result,
+                'starttime': instance.starttime,
+                'endtime': instance.endtime,
+                'duration': duration,
+                'state': instance.state,
+            }
+        return self._reduce_instances(workload, instances)
+
+    def _submit_instance(self, experiment, instance, replicas):
+        # replicas start at once instead of queueing for the workers of the run phase
+        if replicas == 1 or self._is_coroutine_interface(instance, 'run'):
+            return self.submit(experiment, instance, 'run')
+        return self._driver_executor.submit(self._exec_with_context, experiment, instance, 'run')
+
+    def _reduce_instances(self, workload, instances):
+        state = CommonComponentState.COMPLETED
+        completed = []
+        for instance in instances:
+            if instance.state == CommonComponentState.COMPLETED:
+                completed.append(instance)
+            else:
+                state = CommonComponentState.ERROR
+        result = None
+        try:
+            result = Reducer.reduce(
+                workload.reducer, [instance.result for instance in completed], workload)
+        except:
+            state = CommonComponentState.ERROR
+            logger.exception('Error from reducer of workload {}'.format(workload.name))
+        starttimes = [instance.starttime for instance in instances if instance.starttime]
+        endtimes = [instance.endtime for instance in completed]
+        duration = None
+        if state == CommonComponentState.COMPLETED:
+            duration = (max(endtimes) - min(starttimes)).total_seconds()
+        return {
+            'result': result,
+            'starttime': min(starttimes) if starttimes else None,
+            'endtime': max(endtimes) if endtimes else None,
+            'duration': duration,
+            'state': state,
+            'replicas': [instance.result for instance in instances],
+        }
+
+    def _get_run(self, workload, key, samples):
+        completed = [sample for sample in samples
+                     if sample['state'] == CommonComponentState.COMPLETED]
+        state = CommonComponentState.COMPLETED
+        if len(completed) < len(samples):
+            state = CommonComponentState.ERROR
+        results = [sample['result'] for sample in samples]
+        run = {
+            'params': dict(key),
+            'result': results[0] if len(results) == 1 else results,
+            'starttime': samples[0]['starttime'],
+            'endtime': samples[-1]['endtime'],
+            'state': state,
+            'samples': samples,
+        }
+        run.update(Statistics.summarize(completed, workload.confidence))
+        return run
+
+    def _release_workload(self, future):
+        try:
+            workload = self._future_to_component[future]
+            if not future.exception():
+                workload.result = future.result()
+            self._resource_release_executor.release_workload(workload)
+        finally:
+            with self._released_condition:
+                self._released += 1
+                self._released_condition.notify_all()
+
+    def _wait_released(self):
+        # done callbacks run after the waiters of a future are notified
+        with self._released_condition:
+            while self._released < len(self._workload_futures):
+                self._released_condition.wait(1)
 
     def collect_results(self):
         try:
-            for future in futures.as_completed(self._future_to_component):
-                workload = self._future_to_component[future]
+            # wait with timeout to stay responsive to KeyboardInterrupt
+            while not self._all_submitted.wait(1):
+                pass
+            for future in futures.as_completed(self._workload_futures):
+                workload = self._workload_futures[future]
                 workload.result = future.result()
+            if self._resource_release_executor is not None:
+                self._wait_released()
         except KeyboardInterrupt:
             self._threads.clear()
+            self._driver_executor._threads.clear()
             futures.thread._threads_queues.clear()
             raise
+        self._driver_executor.shutdown(wait=False)
 
 
 class WorkloadCleanExecutor(ComponentExecutor):
+    component_type = 'workload'
+    phase = 'clean'
+
     def submit_workloads(self, experiment):
         workloads = experiment.components['workload']
         for workload in workloads.itervalues():
-            logger.info('Submit workload {}.clean(context)'.format(workload.name))
-            self.submit(experiment, workload, 'clean')
+            self.submit_workload(experiment, workload)
+
+    def submit_workload(self, experiment, workload):
+        logger.info('Submit workload {}.clean(context)'.format(workload.name))
+        return self.submit(experiment, workload, 'clean')
 
 
 class ResourceDeployExecutor(ComponentExecutor):
+    component_type = 'resource'
+    phase = 'deploy'
+
+    def __init__(self, concurrency=None):
+        super(ResourceDeployExecutor, self).__init__(concurrency)
+        self._name_to_future = {}
+
     def submit_resources(self, experiment):
         resources = experiment.components['resource']
         for resource in resources.itervalues():
             logger.info('Submit resource {}.deploy(context)'.format(resource.name))
-            self.submit(experiment, resource, 'deploy')
+            future = self.submit(experiment, resource, 'deploy')
+            self._name_to_future[resource.name] = future
+
+    def _store_result(self, component, result):
+        component.endpoint = result
+
+    def get_future(self, resource_name):
+        return self._name_to_future.get(resource_name)
+
+    def get_futures(self):
+        return self._name_to_future.values()
 
     def collect_endpoints(self):
         for future in futures.as_completed(self._future_to_component):
-            resource = self._future_to_component[future]
-            resource.endpoint = future.result() 
+            exception = future.exception()
+            if exception:
+                logger.error(exception)
+            else:
+                resource = self._future_to_component[future]
+                resource.endpoint = future.result()
 
 
 class ResourceCleanExecutor(ComponentExecutor):
+    component_type = 'resource'
+    phase = 'clean'
+
     def submit_resources(self, experiment):
         resources = experiment.components['resource']
         for resource in resources.itervalues():
-            logger.info('Submit resource {}.clean(context)'.format(resource.name))
-            self.submit(experiment, resource, 'clean')
+            self.submit_resource(experiment, resource)
+
+    def submit_resource(self, experiment, resource):
+        logger.info('Submit resource {}.clean(context)'.format(resource.name))
+        return self.submit(experiment, resource, 'clean')
+
+
+class ResourceReleaseExecutor(ResourceCleanExecutor):
+    """Clean each resource as soon as the last workload using it is cleaned.
+
+    The resources are reference counted by the workloads which reference them
+    in their 'resources' mapping. A finished workload is cleaned at once and
+    releases its resources afterwards. Resources without references are
+    cleaned by wait(). No resource is cleaned before the systemcollectors
+    of systemcollector_collect_executor have collected.
+    """
+
+    def __init__(self, experiment, concurrency=None, systemcollector_collect_executor=None):
+        super(ResourceReleaseExecutor, self).__init__(concurrency)
+        self._experiment = experiment
+        self._systemcollector_collect_executor = systemcollector_collect_executor
+        self._lock = threading.Lock()
+        self._released = set()
+        self._submitted = 0
+        self._submitted_condition = threading.Condition()
+        self._references = self._count_references(experiment)
+        self._workload_clean_executor = WorkloadCleanExecutor(self._concurrency)
+
+    def _count_references(self, experiment):
+        references = defaultdict(int)
+        resources = experiment.components['resource']
+        for workload in experiment.components['workload'].itervalues():
+            for resource_name in _get_resource_names(workload):
+                if resource_name in resources:
+                    references[resource_name] += 1
+        return references
+
+    def release_workload(self, workload):
+        future = self._workload_clean_executor.submit_workload(self._experiment, workload)
+        future.add_done_callback(lambda future: self._release_resources(workload))
+
+    def _release_resources(self, workload):
+        for resource_name in _get_resource_names(workload):
+            with self._lock:
+                if resource_name not in self._references:
+                    continue
+                self._references[resource_name] -= 1
+                if self._references[resource_name] > 0:
+                    continue
+            self._release_resource(resource_name)
+
+    def _release_resource(self, resource_name):
+        with self._lock:
+            if resource_name in self._released:
+                return
+            self._released.add(resource_name)
+        resource = self._experiment.components['resource'][resource_name]
+        wait_futures = []
+        if self._systemcollector_collect_executor is not None:
+            wait_futures.append(self._systemcollector_collect_executor.get_future())
+        _when_done(wait_futures, self._submit_released, resource)
+
+    def _submit_released(self, resource):
+        with self._submitted_condition:
+            try:
+                self.submit_resource(self._experiment, resource)
+            finally:
+                self._submitted += 1
+                self._submitted_condition.notify_all()
+
+    def wait(self):
+        self._workload_clean_executor.wait()
+        for resource_name in self._experiment.components['resource']:
+            self._release_resource(resource_name)
+        # released resources are submitted once the systemcollectors are done
+        with self._submitted_condition:
+            while self._submitted < len(self._released):
+                self._submitted_condition.wait(1)
+        super(ResourceReleaseExecutor, self).wait()
 
 
 class SystemCollectorCollectExecutor(ComponentExecutor):
-    def submit_systemcollectors(self, experiment):
+    component_type = 'systemcollector'
+    phase = 'collect'
+
+    def __init__(self, concurrency=None):
+        super(SystemCollectorCollectExecutor, self).__init__(concurrency)
+        self._all_submitted = threading.Event()
+        self._collected_future = futures.Future()
+
+    def submit_systemcollectors(self, experiment, resource_deploy_executor=None):
+        """Submit the systemcollectors once all resources are deployed"""
+        deploy_futures = []
+        if resource_deploy_executor is not None:
+            deploy_futures = resource_deploy_executor.get_futures()
+        _when_done(deploy_futures, self._submit_systemcollectors, experiment)
+
+    def _submit_systemcollectors(self, experiment):
         systemcollectors = experiment.components['systemcollector']
         for systemcollector in systemcollectors.itervalues():
             msg = 'Submit systemcollector {}.collect(context)'
             logger.info(msg.format(systemcollector.name))
             self.submit(experiment, systemcollector, 'collect')
+        self._all_submitted.set()
+        _when_done(list(self._future_to_component), self._collected_future.set_result, None)
+
+    def get_future(self):
+        """Future which is done once all systemcollectors have collected"""
+        return self._collected_future
+
+    def wait(self):
+        # wait with timeout to stay responsive to KeyboardInterrupt
+        while not self._all_submitted.wait(1):
+            pass
+        super(SystemCollectorCollectExecutor, self).wait()
 
     def collect_results(self):
         for future in futures.as_completed(self._future_to_component):
@@ -129,6 +972,9 @@ class SystemCollectorCollectExecutor(ComponentExecutor):
 
 
 class ResultStoreSubmitExecutor(ComponentExecutor):
+    component_type = 'resultstore'
+    phase = 'submit'
+
     def submit_resultstores(self, experiment):
         resultstores = experiment.components['resultstore']
         for resultstore in resultstores.itervalues():
@@ -1,21 +1,55 @@
+from collections import OrderedDict
+import hashlib
 import logging
 import imp
+import marshal
 import os
+import struct
 import sys
+import threading
 import uuid
 
 logger = logging.getLogger(__name__)
 
 
 class ModuleLoader(object):
+    """Load component modules without touching sys.path.
+
+    Every component module is loaded into its own virtual package whose
+    __path__ is the component directory, so the implicit relative imports
+    of python 2 find the helper modules of the component. Compiled code
+    objects of the code_cache_size most recently loaded sources are cached
+    by the hash of the source and read from up to date bytecode next to the
+    source if available. unload removes the package and all its modules
+    from sys.modules.
+    """
+    code_cache_size = 64
+    _code_cache = OrderedDict()
+    _code_cache_lock = threading.Lock()
+
     @classmethod
     def load_by_path(cls, path, name, parent_module_name):
+        path = os.path.abspath(path)
         parent_module = cls.create_parent_module(parent_module_name)
         uuid_hex = uuid.uuid4().hex[:8]
         name = name or 'anonymous_component'
-        name = "{}.{}_{}".format(parent_module.__name__, uuid_hex, name)
-        cls.add_syspath(path)
-        module_ = imp.load_source(name, path)
+        package_name = "{}.{}_{}".format(parent_module.__name__, uuid_hex, name)
+        module_name = os.path.splitext(os.path.basename(path))[0]
+        imp.acquire_lock()
+        try:
+            package = cls.create_package(package_name, os.path.dirname(path))
+            module_ = imp.new_module("{}.{}".format(package_name, module_name))
+            module_.__file__ = path
+            module_.__package__ = package_name
+            sys.modules[module_.__name__] = module_
+            setattr(package, module_name, module_)
+            try:
+                exec cls.get_code(path) in module_.__dict__
+            except:
+                cls.unload(module_)
+                raise
+        finally:
+            imp.release_lock()
         return module_
 
     @classmethod
@@ -26,6 +60,36 @@ class ModuleLoader(object):
             component.parent_module_name)
         return module_
 
+    @classmethod
+    def get_code(cls, path):
+        with open(path, 'rU') as source_file:
+            source = source_file.read()
+        source_hash = hashlib.sha1(source).hexdigest()
+        with cls._code_cache_lock:
+            code = cls._code_cache.pop(source_hash, None)
+        if code is None:
+            code = cls._load_bytecode(path)
+        if code is None:
+            code = compile(source, path, 'exec', 0, True)
+        with cls._code_cache_lock:
+            cls._code_cache[source_hash] = code
+            while len(cls._code_cache) > cls.code_cache_size:
+                cls._code_cache.popitem(last=False)
+        return code
+
+    @classmethod
+    def _load_bytecode(cls, path):
+        try:
+            with open(path + 'c', 'rb') as bytecode_file:
+                if bytecode_file.read(4) != imp.get_magic():
+                    return None
+                mtime = struct.unpack('<I', bytecode_file.read(4))[0]
+                if mtime != int(os.stat(path).st_mtime) & 0xFFFFFFFF:
+                    return None
+                return marshal.load(bytecode_file)
+        except (IOError, OSError, EOFError, ValueError, TypeError, struct.error):
+            return None
+
     @classmethod
     def create_parent_module(cls, parent_module_name):
         parent_module = sys.modules.setdefault(
@@ -35,6 +99,24 @@ class ModuleLoader(object):
         return parent_module
 
     @classmethod
-    def add_syspath(cls, path):
-        path = os.path.dirname(os.path.abspath(path))
-        sys.path.insert(0, path)
+    def create_package(cls, package_name, path):
+        package = imp.new_module(package_name)
+        package.__file__ = '<virtual {}>'.format(package_name)
+        package.__path__ = [path]
+        package.__package__ = package_name
+        sys.modules[package_name] = package
+        return package
+
+    @classmethod
+    def unload(cls, module_):
+        package_name = getattr(module_, '__package__', None)
+        package = sys.modules.get(package_name)
+        if not getattr(package, '__file__', '').startswith('<virtual'):
+            return
+        imp.acquire_lock()
+        try:
+            for name in list(sys.modules):
+                if name == package_name or name.startswith(package_name + '.'):
+                    del sys.modules[name]
+        finally:
+            imp.release_lock()
@@ -0,0 +1,76 @@
+import logging
+
+from scotty.core.exceptions import WorkloadException
+from scotty.core.statistics import Statistics
+
+logger = logging.getLogger(__name__)
+
+
+class Reducer(object):
+    """Merges the results of the replicas of a workload run.
+
+    The built-in reducers are list, sum, histogram, mean, min and max. sum
+    and histogram add numbers, dicts key by key and lists element by element,
+    so throughputs and histograms of bucket counts merge the same way. Any
+    other name is a function reducer(results) of the workload module. A dict
+    maps the keys of dict results to reducers, keys without reducer are
+    reduced to lists.
+    """
+    builtins = ['list', 'sum', 'histogram', 'mean', 'min', 'max']
+
+    @classmethod
+    def reduce(cls, reducer, results, workload=None):
+        if isinstance(reducer, dict):
+            return cls._reduce_keys(reducer, results, workload)
+        if reducer == 'list':
+            return list(results)
+        if reducer in ['sum', 'histogram']:
+            return cls._merge(results, sum)
+        if reducer == 'mean':
+            return cls._merge(results, lambda values: float(sum(values)) / len(values))
+        if reducer == 'min':
+            return cls._merge(results, min)
+        if reducer == 'max':
+            return cls._merge(results, max)
+        return getattr(workload.module, reducer)(results)
+
+    @classmethod
+    def get_custom_reducers(cls, reducer):
+        """Names of the reducers which are functions of the workload module"""
+        if isinstance(reducer, dict):
+            reducers = reducer.values()
+        else:
+            reducers = [reducer]
+        return sorted(set(reducers) - set(cls.builtins))
+
+    @classmethod
+    def _reduce_keys(cls, reducers, results, workload):
+        if not all(isinstance(result, dict) for result in results):
+            raise WorkloadException('Reducers by key need dict results')
+        keys = []
+        for result in results:
+            keys.extend(key for key in result if key not in keys)
+        reduced = {}
+        for key in keys:
+            values = [result[key] for result in results if key in result]
+            reduced[key] = cls.reduce(reducers.get(key, 'list'), values, workload)
+        return reduced
+
+    @classmethod
+    def _merge(cls, values, function_):
+        if not values:
+            return None
+        if all(Statistics.is_number(value) for value in values):
+            return function_(values)
+        if all(isinstance(value, dict) for value in values):
+            keys = []
+            for value in values:
+                keys.extend(key for key in value if key not in keys)
+            return dict(
+                (key, cls._merge([value[key] for value in values if key in value], function_))
+                for key in keys)
+        if all(isinstance(value, (list, tuple)) for value in values):
+            if len(set(len(value) for value in values)) > 1:
+                raise WorkloadException('Can not merge lists of different length')
+            return [cls._merge(list(column), function_) for column in zip(*values)]
+        raise WorkloadException('Can not merge results {}'.format(values))
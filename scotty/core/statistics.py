@@ -0,0 +1,152 @@
+import logging
+import math
+import numbers
+
+logger = logging.getLogger(__name__)
+
+
+class Statistics(object):
+    """Aggregates over the repetitions of a workload run.
+
+    Values are collected in NumPy arrays with one row per repetition. The
+    aggregates of all columns (e.g. the metrics of a result dict) are
+    computed at once along the repetition axis. NumPy is imported on first
+    use, so commands which never aggregate do not load it.
+    """
+    percentiles = [50, 95, 99]
+    # two-sided quantiles of the student t distribution for 1 to 30 degrees of freedom
+    _t_quantiles = {
+        0.90: [6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812,
+               1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734, 1.729, 1.725,
+               1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703, 1.701, 1.699, 1.697],
+        0.95: [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+               2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+               2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042],
+        0.99: [63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169,
+               3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878, 2.861, 2.845,
+               2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771, 2.763, 2.756, 2.750],
+    }
+    _z_quantiles = {0.90: 1.645, 0.95: 1.960, 0.99: 2.576}
+    confidences = sorted(_t_quantiles)
+
+    @classmethod
+    def t_quantile(cls, degrees_of_freedom, confidence=0.95):
+        if degrees_of_freedom < 1:
+            return float('nan')
+        if degrees_of_freedom > len(cls._t_quantiles[confidence]):
+            return cls._z_quantiles[confidence]
+        return cls._t_quantiles[confidence][degrees_of_freedom - 1]
+
+    @classmethod
+    def describe(cls, values, confidence=0.95):
+        """Aggregates of a (repetitions,) or (repetitions, columns) array"""
+        import numpy
+        values = numpy.asarray(values, dtype=float)
+        count = values.shape[0]
+        if not count:
+            return None
+        mean = values.mean(axis=0)
+        if count > 1:
+            stddev = values.std(axis=0, ddof=1)
+        else:
+            stddev = numpy.zeros_like(mean)
+        median, p95, p99 = numpy.percentile(values, cls.percentiles, axis=0)
+        half_width = cls.t_quantile(count - 1, confidence) * stddev / math.sqrt(count)
+        return {
+            'n': count,
+            'mean': mean,
+            'stddev': stddev,
+            'min': values.min(axis=0),
+            'max': values.max(axis=0),
+            'median': median,
+            'p95': p95,
+            'p99': p99,
+            'ci_low': mean - half_width,
+            'ci_high': mean + half_width,
+            'confidence': confidence,
+        }
+
+    @classmethod
+    def summarize(cls, samples, confidence=0.95):
+        """Values and aggregates of the duration and numeric results of samples.
+
+        Numeric results are numbers or dicts of numbers (metrics). Results of
+        other types are not aggregated.
+        """
+        import numpy
+        durations = numpy.array([sample['duration'] for sample in samples], dtype=float)
+        values = {'duration': durations}
+        summary = {'duration': cls._to_python(cls.describe(durations, confidence))}
+        results = [sample['result'] for sample in samples]
+        if results and all(cls.is_number(result) for result in results):
+            values['result'] = numpy.array(results, dtype=float)
+            summary['result'] = cls._to_python(cls.describe(values['result'], confidence))
+        elif results and all(cls._is_metrics(result) for result in results):
+            metrics = sorted(set.intersection(*[set(result) for result in results]))
+            metric_values = numpy.array(
+                [[result[metric] for metric in metrics] for result in results], dtype=float)
+            metric_summary = cls.describe(metric_values, confidence)
+            values['result'] = dict(
+                (metric, metric_values[:, index]) for index, metric in enumerate(metrics))
+            summary['result'] = dict(
+                (metric, cls._to_python(metric_summary, index))
+                for index, metric in enumerate(metrics))
+        return {'values': values, 'summary': summary}
+
+    @classmethod
+    def relative_error(cls, values, confidence=0.95):
+        """Half width of the confidence interval relative to the mean"""
+        stats = cls.describe(values, confidence)
+        if stats is None or stats['n'] < 2:
+            return None
+        half_width = float(stats['ci_high'] - stats['mean'])
+        mean = abs(float(stats['mean']))
+        if not mean:
+            return 0.0 if not half_width else float('inf')
+        return half_width / mean
+
+    @classmethod
+    def metric_values(cls, samples, metric):
+        """Values of a metric of samples, None if a sample has no numeric value.
+
+        The metric is the duration, the result or the name of a value of a
+        result dict.
+        """
+        import numpy
+        values = []
+        for sample in samples:
+            if metric == 'duration':
+                value = sample['duration']
+            elif metric == 'result':
+                value = sample['result']
+            elif isinstance(sample['result'], dict):
+                value = sample['result'].get(metric)
+            else:
+                value = None
+            if not cls.is_number(value):
+                return None
+            values.append(value)
+        return numpy.array(values, dtype=float)
+
+    @classmethod
+    def is_number(cls, value):
+        return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+    @classmethod
+    def _is_metrics(cls, value):
+        return isinstance(value, dict) and value and all(
+            cls.is_number(metric_value) for metric_value in value.itervalues())
+
+    @classmethod
+    def _to_python(cls, stats, index=None):
+        import numpy
+        if stats is None:
+            return None
+        python_stats = {}
+        for name, value in stats.iteritems():
+            if isinstance(value, numpy.ndarray):
+                value = value[index] if index is not None else value.item()
+            if isinstance(value, numpy.generic):
+                value = value.item()
+            python_stats[name] = value
+        return python_stats
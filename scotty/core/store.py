@@ -0,0 +1,261 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import stat
+import subprocess
+import sys
+import time
+import uuid
+
+from scotty.config import ScottyConfig
+from scotty.core.checkout import FileLock
+from scotty.core.checkout import FileSync
+from scotty.core.exceptions import ScottyException
+from scotty.utils import parse_duration
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentStore(object):
+    """Content addressed store of populated component sources.
+
+    Every entry is a tree named by the hash of its content and is never
+    modified in place, its files are read-only. Equal trees are stored once
+    and component workspaces are hard linked views on the entries. The
+    modification time of an entry is its last use, the garbage collector
+    removes the least recently used entries first.
+    """
+    ignore = ('.scotty', '.git', '*.pyc')
+    digests_name = 'digests.json'
+    # files modified within the mtime resolution after hashing keep their stat
+    racy_seconds = 2
+    # entries used more recently are not collected, other experiments may link them
+    gc_grace = 3600
+    _pattern_size = re.compile(r'^(\d+)\s*([kmgt]?)b?$', re.IGNORECASE)
+    _size_units = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+    @classmethod
+    def tree_hash(cls, path, digests=None):
+        """Hash of the tree in path.
+
+        digests maps file paths to [inode, size, mtime, sha1] of earlier
+        hashes. A digest is reused if the stat of the file is unchanged and
+        new digests are added to the mapping.
+        """
+        sha1 = hashlib.sha1()
+        path = os.path.abspath(path)
+        for source_dir, dirs, files in os.walk(path, followlinks=True):
+            dirs[:] = sorted(dir_ for dir_ in dirs if not cls._is_ignored(dir_))
+            for file_ in sorted(files):
+                if cls._is_ignored(file_):
+                    continue
+                file_path = os.path.join(source_dir, file_)
+                rel_path = os.path.relpath(file_path, path)
+                executable = os.access(file_path, os.X_OK)
+                file_hash = cls._hash_file(file_path, digests)
+                sha1.update('{}\0{:d}\0{}\n'.format(rel_path, executable, file_hash))
+        return sha1.hexdigest()
+
+    @classmethod
+    def _hash_file(cls, file_path, digests):
+        if digests is None:
+            return FileSync.hash_file(file_path)
+        file_stat = os.stat(file_path)
+        key = [file_stat.st_ino, file_stat.st_size, file_stat.st_mtime]
+        digest = digests.pop(file_path, None)
+        if digest is not None and digest[:3] == key:
+            digests[file_path] = digest
+            return digest[3]
+        file_hash = FileSync.hash_file(file_path)
+        if time.time() - file_stat.st_mtime > cls.racy_seconds:
+            digests[file_path] = key + [file_hash]
+        return file_hash
+
+    @classmethod
+    def _load_digests(cls, store_path):
+        try:
+            with open(os.path.join(store_path, cls.digests_name)) as digests_file:
+                return json.load(digests_file)
+        except (IOError, ValueError):
+            return {}
+
+    @classmethod
+    def _save_digests(cls, store_path, digests):
+        digests_path = os.path.join(store_path, cls.digests_name)
+        with FileLock.lock(digests_path):
+            saved_digests = cls._load_digests(store_path)
+            saved_digests.update(digests)
+            saved_digests = dict(
+                (file_path, digest) for file_path, digest in saved_digests.iteritems()
+                if os.path.exists(file_path))
+            tmp_path = '{}.tmp-{}'.format(digests_path, uuid.uuid4().hex)
+            with open(tmp_path, 'w') as digests_file:
+                json.dump(saved_digests, digests_file)
+            os.rename(tmp_path, digests_path)
+
+    @classmethod
+    def _is_ignored(cls, name):
+        return FileSync._is_ignored(name, cls.ignore)
+
+    @classmethod
+    def add(cls, store_path, source_path):
+        """Add the tree in source_path and return the path of its entry.
+
+        The files of the entry are cloned or copied from source_path, not
+        hard linked, and made read-only, so neither the source nor the
+        component workspaces linking the entry can modify it.
+        """
+        saved_digests = cls._load_digests(store_path)
+        digests = dict(saved_digests)
+        tree_hash = cls.tree_hash(source_path, digests)
+        if digests != saved_digests:
+            cls._save_digests(store_path, digests)
+        entry_path = os.path.join(store_path, tree_hash)
+        with FileLock.lock(entry_path):
+            if os.path.isdir(entry_path):
+                os.utime(entry_path, None)
+                return entry_path
+            logger.debug('Add {} to component store'.format(tree_hash))
+            tmp_path = '{}.tmp-{}'.format(entry_path, uuid.uuid4().hex)
+            try:
+                FileSync.sync(source_path, tmp_path, link='reflink', ignore=cls.ignore)
+                cls._make_read_only(tmp_path)
+                os.rename(tmp_path, entry_path)
+            except OSError:
+                if not os.path.isdir(entry_path):
+                    raise
+            finally:
+                if os.path.isdir(tmp_path):
+                    shutil.rmtree(tmp_path)
+        return entry_path
+
+    @classmethod
+    def _make_read_only(cls, path):
+        write_bits = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+        for dir_, dirs, files in os.walk(path):
+            for file_ in files:
+                file_path = os.path.join(dir_, file_)
+                mode = os.lstat(file_path).st_mode
+                if stat.S_ISREG(mode) and mode & write_bits:
+                    os.chmod(file_path, stat.S_IMODE(mode) & ~write_bits)
+
+    @classmethod
+    def compile(cls, entry_path):
+        """Byte-compile the python modules of an entry once.
+
+        Compiling runs in a separate interpreter, so the entries of
+        components prepared in parallel are compiled in parallel.
+        """
+        marker_path = entry_path + '.compiled'
+        if os.path.isfile(marker_path):
+            return
+        with FileLock.lock(entry_path):
+            if os.path.isfile(marker_path):
+                return
+            logger.debug('Compile {}'.format(entry_path))
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'compileall', '-q', entry_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT)
+            output = process.communicate()[0]
+            if process.returncode:
+                msg = 'Could not compile all modules in {}:\n{}'
+                logger.warning(msg.format(entry_path, output))
+            cls._make_read_only(entry_path)
+            open(marker_path, 'w').close()
+
+    @classmethod
+    def get_entries(cls, store_path):
+        entries = []
+        if not os.path.isdir(store_path):
+            return entries
+        for name in os.listdir(store_path):
+            entry_path = os.path.join(store_path, name)
+            if '.' in name or not os.path.isdir(entry_path):
+                continue
+            entries.append({
+                'path': entry_path,
+                'used': os.stat(entry_path).st_mtime,
+                'size': cls._get_size(entry_path),
+            })
+        entries.sort(key=lambda entry: entry['used'])
+        return entries
+
+    @classmethod
+    def _get_size(cls, path):
+        size = 0
+        for dir_, dirs, files in os.walk(path):
+            for file_ in files:
+                size += os.lstat(os.path.join(dir_, file_)).st_size
+        return size
+
+    @classmethod
+    def gc(cls, store_path, max_size=None, max_age=None, keep=(), grace=None):
+        """Remove entries older than max_age seconds and the least recently
+        used entries until the store fits max_size bytes. Entries in keep,
+        entries used within the last grace seconds and locked entries are
+        never removed. Returns the paths of the removed entries.
+        """
+        if grace is None:
+            grace = cls.gc_grace
+        keep = set(os.path.abspath(path) for path in keep)
+        entries = cls.get_entries(store_path)
+        size = sum(entry['size'] for entry in entries)
+        now = time.time()
+        removed = []
+        for entry in entries:
+            if os.path.abspath(entry['path']) in keep:
+                continue
+            expired = max_age is not None and now - entry['used'] > max_age
+            oversized = max_size is not None and size > max_size
+            if not expired and not oversized:
+                continue
+            # the lock file is kept, other processes may hold or wait for it
+            with FileLock.try_lock(entry['path']) as locked:
+                if not locked or not cls._is_collectable(entry['path'], now, grace):
+                    continue
+                shutil.rmtree(entry['path'])
+                if os.path.isfile(entry['path'] + '.compiled'):
+                    os.remove(entry['path'] + '.compiled')
+            size -= entry['size']
+            removed.append(entry['path'])
+            logger.debug('Removed {} from component store'.format(entry['path']))
+        return removed
+
+    @classmethod
+    def _is_collectable(cls, entry_path, now, grace):
+        # the entry may have been used since it was listed
+        if not os.path.isdir(entry_path):
+            return False
+        return now - os.stat(entry_path).st_mtime >= grace
+
+    @classmethod
+    def get_limits(cls):
+        scotty_config = ScottyConfig()
+        max_size = None
+        max_age = None
+        if scotty_config.has_option('cache', 'store_max_size'):
+            max_size = cls.parse_size(scotty_config.get('cache', 'store_max_size'))
+        if scotty_config.has_option('cache', 'store_max_age'):
+            max_age = cls.parse_age(scotty_config.get('cache', 'store_max_age'))
+        return max_size, max_age
+
+    @classmethod
+    def parse_size(cls, size):
+        return cls._parse(size, cls._pattern_size, cls._size_units, 'size')
+
+    @classmethod
+    def parse_age(cls, age):
+        return parse_duration(age)
+
+    @classmethod
+    def _parse(cls, value, pattern, units, name):
+        if value is None or str(value).strip() == '':
+            return None
+        match = pattern.match(str(value).strip())
+        if not match:
+            raise ScottyException('Invalid store {}: {}'.format(name, value))
+        return int(match.group(1)) * units[match.group(2).lower()]
@@ -1,5 +1,4 @@
 import os
-import contextlib
 
 from scotty.core.exceptions import ExperimentException
 
@@ -16,13 +15,6 @@ class Workspace(object):
     def config_path(self, path):
         self._config_path = path
 
-    @contextlib.contextmanager
-    def cwd(self):
-        prev_cwd = os.getcwd()
-        os.chdir(self.path)
-        yield
-        os.chdir(prev_cwd)
-
     @classmethod
     def factory(cls, component, workspace_path, create_paths = False):
         if component.isinstance('Workload'):
@@ -73,8 +65,12 @@ class ExperimentWorkspace(Workspace):
     def create_base_paths(self):
         self.scotty_path = os.path.join(self.path, '.scotty')
         self.components_base_path = os.path.join(self.scotty_path, 'components')
+        self.sources_path = os.path.join(self.scotty_path, 'sources')
+        self.store_path = os.path.join(self.scotty_path, 'store')
         self.create_path(self.scotty_path)
         self.create_path(self.components_base_path)
+        self.create_path(self.sources_path)
+        self.create_path(self.store_path)
 
     def create_component_path(self, component_type):
         path = os.path.join(self.components_base_path, component_type)
@@ -85,6 +81,9 @@ class ExperimentWorkspace(Workspace):
         if not os.path.isdir(path):
             os.mkdir(path)
 
+    def get_source_path(self, component):
+        return os.path.join(self.sources_path, component.source_key)
+
     def get_component_path(self, component, create_on_demand=False):
         if component.type in self.supported_components:
             path = os.path.join(self.component_path[component.type], component.name)
@@ -0,0 +1,52 @@
+"""Startup benchmark of the scotty command line interface.
+
+Runs every command line in a fresh interpreter and reports the wall time:
+
+    python -m scotty.tests.benchmark.startup [repetitions]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+scotty_script = os.path.join(base_dir, 'scotty.py')
+# removed before every run, workload init refuses an existing workload
+init_dir = os.path.join(tempfile.gettempdir(), 'scotty-benchmark-workload')
+
+benchmarks = [
+    ('python', [sys.executable, '-c', 'pass']),
+    ('import scotty.cli', [sys.executable, '-c', 'import scotty.cli']),
+    ('scotty --help', [sys.executable, scotty_script, '--help']),
+    ('scotty workload --help', [sys.executable, scotty_script, 'workload', '--help']),
+    ('scotty experiment --help', [sys.executable, scotty_script, 'experiment', '--help']),
+    ('scotty workload init', [sys.executable, scotty_script, 'workload', 'init', init_dir]),
+    ('import workflows', [sys.executable, '-c', 'import scotty.workflows.experiment']),
+]
+
+
+def measure(args, repetitions):
+    timings = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(repetitions):
+            shutil.rmtree(init_dir, ignore_errors=True)
+            starttime = time.time()
+            subprocess.call(args, cwd=base_dir, stdout=devnull, stderr=devnull)
+            timings.append(time.time() - starttime)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
+
+
+def run(repetitions=10):
+    sys.stdout.write('{:<28} {:>10} {:>10}\n'.format('command', 'min [ms]', 'median [ms]'))
+    for name, args in benchmarks:
+        min_time, median_time = measure(args, repetitions)
+        sys.stdout.write('{:<28} {:>10.1f} {:>10.1f}\n'.format(
+            name, min_time * 1000, median_time * 1000))
+    shutil.rmtree(init_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
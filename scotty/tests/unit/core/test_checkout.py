@@ -1,7 +1,21 @@
+import glob
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
 import unittest
+import zipfile
+
+import git
 import mock
 
+from scotty.core.checkout import ArchiveCache
+from scotty.core.checkout import CheckoutManager
+from scotty.core.checkout import GitMirrorCache
+from scotty.core.checkout import FileSync
 from scotty.core.components import Component
+from scotty.core.exceptions import ScottyException
 
 class ComponentTest(unittest.TestCase):
     def test_generator_location(self):
@@ -53,3 +67,279 @@ class ComponentTest(unittest.TestCase):
         component = Component()
         component.config = config
         self.assertEqual(component.generator['type'], "git")
+
+    def test_generator_checkout_options(self):
+        config = {
+            "generator":"git:git@gitlab.gwdg.de:repository.py.git[master]",
+            "checkout":{"depth":1, "filter":"blob:none", "sparse":["workload_gen.py"]}
+        }
+        component = Component()
+        component.config = config
+        self.assertEqual(component.generator['depth'], 1)
+        self.assertEqual(component.generator['filter'], "blob:none")
+        self.assertEqual(component.generator['sparse'], ["workload_gen.py"])
+
+
+class GitMirrorCacheTest(unittest.TestCase):
+    def test_normalize_url(self):
+        urls = [
+            'git@gitlab.gwdg.de:scotty/workload/demo.git',
+            'ssh://git@GitLab.gwdg.de/scotty/workload/demo',
+            'https://gitlab.gwdg.de/scotty/workload/demo.git/',
+        ]
+        normalized_urls = set(map(GitMirrorCache.normalize_url, urls))
+        self.assertEqual(normalized_urls, set(['gitlab.gwdg.de/scotty/workload/demo']))
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_get_mirror_path(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = '/var/cache/scotty'
+        mirror_path = GitMirrorCache.get_mirror_path('git@gitlab.gwdg.de:scotty/demo.git')
+        self.assertTrue(mirror_path.startswith('/var/cache/scotty/gitlab.gwdg.de_scotty_demo-'))
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_get_mirror_path_disabled(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = None
+        self.assertIsNone(GitMirrorCache.get_mirror_path('git@gitlab.gwdg.de:scotty/demo.git'))
+
+
+class CheckoutManagerGitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.origin_path = os.path.join(self.tmp_path, 'origin')
+        origin = git.Repo.init(self.origin_path)
+        origin.git.config('user.email', 'scotty@localhost')
+        origin.git.config('user.name', 'scotty')
+        with open(os.path.join(self.origin_path, 'workload_gen.py'), 'w') as f:
+            f.write('def run(context):\n    pass\n')
+        os.mkdir(os.path.join(self.origin_path, 'data'))
+        with open(os.path.join(self.origin_path, 'data', 'large.dat'), 'w') as f:
+            f.write('data')
+        origin.git.add('workload_gen.py', 'data')
+        origin.git.commit('-m', 'Add workload')
+        self.commit = origin.head.commit.hexsha
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def workspace(self, name):
+        return mock.Mock(path=os.path.join(self.tmp_path, name))
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_checkout_from_mirror(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = os.path.join(self.tmp_path, 'mirrors')
+        for name in ['workload_1', 'workload_2']:
+            workspace = self.workspace(name)
+            CheckoutManager.checkout(self.origin_path, workspace)
+            alternates = os.path.join(workspace.path, '.git/objects/info/alternates')
+            self.assertTrue(os.path.isfile(alternates))
+            self.assertTrue(os.path.isfile(os.path.join(workspace.path, 'workload_gen.py')))
+        self.assertEqual(len(glob.glob(os.path.join(self.tmp_path, 'mirrors', '*.git'))), 1)
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_checkout_pinned_commit_offline(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = None
+        workspace = self.workspace('workload')
+        CheckoutManager.checkout(self.origin_path, workspace, self.commit)
+        shutil.rmtree(self.origin_path)
+        CheckoutManager.checkout(self.origin_path, workspace, self.commit[:12])
+        repo = git.Repo(workspace.path)
+        self.assertEqual(repo.head.commit.hexsha, self.commit)
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_checkout_branch_fetches(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = os.path.join(self.tmp_path, 'mirrors')
+        workspace = self.workspace('workload')
+        origin = git.Repo(self.origin_path)
+        branch = origin.active_branch.name
+        CheckoutManager.checkout(self.origin_path, workspace, branch)
+        origin.git.commit('--allow-empty', '-m', 'Update workload')
+        CheckoutManager.checkout(self.origin_path, workspace, branch)
+        repo = git.Repo(workspace.path)
+        self.assertEqual(repo.head.commit.hexsha, origin.head.commit.hexsha)
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_checkout_shallow_sparse(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = os.path.join(self.tmp_path, 'mirrors')
+        workspace = self.workspace('workload')
+        git_url = 'file://{}'.format(self.origin_path)
+        options = {'depth': 1, 'sparse': ['workload_gen.py']}
+        CheckoutManager.checkout(git_url, workspace, None, options)
+        self.assertTrue(os.path.isfile(os.path.join(workspace.path, '.git/shallow')))
+        self.assertTrue(os.path.isfile(os.path.join(workspace.path, 'workload_gen.py')))
+        self.assertFalse(os.path.exists(os.path.join(workspace.path, 'data')))
+        self.assertFalse(os.path.isdir(os.path.join(self.tmp_path, 'mirrors')))
+        CheckoutManager.checkout(git_url, workspace, None, {'depth': 1})
+        self.assertTrue(os.path.isfile(os.path.join(workspace.path, 'data', 'large.dat')))
+
+    def test_resolve_submodule_url(self):
+        resolve = CheckoutManager._resolve_submodule_url
+        self.assertEqual(
+            resolve('https://gitlab.gwdg.de/scotty/demo.git', '../lib.git'),
+            'https://gitlab.gwdg.de/scotty/lib.git')
+        self.assertEqual(
+            resolve('git@gitlab.gwdg.de:demo.git', '../lib.git'),
+            'git@gitlab.gwdg.de:lib.git')
+        self.assertEqual(resolve('/srv/git/demo', './lib'), '/srv/git/demo/lib')
+        self.assertEqual(resolve('/srv/git/demo', 'git@host:lib.git'), 'git@host:lib.git')
+
+    @mock.patch('scotty.core.checkout.GitMirrorCache.get_mirror_dir')
+    def test_checkout_submodules_from_mirror(self, get_mirror_dir_mock):
+        get_mirror_dir_mock.return_value = os.path.join(self.tmp_path, 'mirrors')
+        library_path = os.path.join(self.tmp_path, 'library')
+        library = git.Repo.init(library_path)
+        library.git.config('user.email', 'scotty@localhost')
+        library.git.config('user.name', 'scotty')
+        with open(os.path.join(library_path, 'helper.py'), 'w') as f:
+            f.write('')
+        library.git.add('helper.py')
+        library.git.commit('-m', 'Add helper')
+        origin = git.Repo(self.origin_path)
+        origin.git(c='protocol.file.allow=always').submodule('add', '../library', 'library')
+        origin.git.commit('-m', 'Add library')
+        workspace = self.workspace('workload')
+        CheckoutManager.checkout(self.origin_path, workspace)
+        self.assertTrue(os.path.isfile(os.path.join(workspace.path, 'library', 'helper.py')))
+        self.assertEqual(len(glob.glob(os.path.join(self.tmp_path, 'mirrors', '*.git'))), 2)
+
+
+class FileSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.source_path = os.path.join(self.tmp_path, 'source')
+        self.target_path = os.path.join(self.tmp_path, 'target')
+        os.makedirs(os.path.join(self.source_path, 'data'))
+        os.makedirs(os.path.join(self.source_path, '.scotty'))
+        self.write('workload_gen.py', 'def run(context):\n    pass\n')
+        self.write('data/large.dat', 'data')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def write(self, rel_path, content):
+        with open(os.path.join(self.source_path, rel_path), 'w') as f:
+            f.write(content)
+
+    def target(self, rel_path):
+        return os.path.join(self.target_path, rel_path)
+
+    def test_sync_incremental(self):
+        FileSync.sync(self.source_path, self.target_path)
+        self.assertFalse(os.path.exists(self.target('.scotty')))
+        self.write('workload_gen.py', 'def run(context):\n    return 1\n')
+        os.remove(os.path.join(self.source_path, 'data/large.dat'))
+        self.write('new.py', '')
+        FileSync.sync(self.source_path, self.target_path, compare='hash')
+        with open(self.target('workload_gen.py')) as f:
+            self.assertIn('return 1', f.read())
+        self.assertFalse(os.path.exists(self.target('data/large.dat')))
+        self.assertTrue(os.path.isfile(self.target('new.py')))
+
+    def test_sync_unchanged_not_copied(self):
+        FileSync.sync(self.source_path, self.target_path)
+        inode = os.stat(self.target('data/large.dat')).st_ino
+        FileSync.sync(self.source_path, self.target_path)
+        self.assertEqual(os.stat(self.target('data/large.dat')).st_ino, inode)
+
+    def test_sync_hardlink(self):
+        FileSync.sync(self.source_path, self.target_path, link='hardlink')
+        self.assertTrue(os.path.samefile(
+            os.path.join(self.source_path, 'data/large.dat'),
+            self.target('data/large.dat')))
+
+    def test_sync_unsupported(self):
+        with self.assertRaises(ScottyException):
+            FileSync.sync(self.source_path, self.target_path, link='symlink')
+
+    def test_populate_file_source(self):
+        component = Component()
+        component.config = {'name': 'demo', 'generator': 'file:source'}
+        workspace = mock.MagicMock()
+        workspace.path = self.target_path
+        CheckoutManager.populate(component, self.tmp_path, workspace)
+        self.assertTrue(os.path.isfile(self.target('workload_gen.py')))
+
+    def test_populate_missing_file_source(self):
+        component = Component()
+        component.config = {'name': 'demo', 'generator': 'file:missing'}
+        workspace = mock.MagicMock()
+        workspace.path = self.target_path
+        with self.assertRaises(ScottyException):
+            CheckoutManager.populate(component, self.tmp_path, workspace)
+
+
+class ArchiveCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.bundle_path = os.path.join(self.tmp_path, 'bundle')
+        os.makedirs(os.path.join(self.bundle_path, 'data'))
+        with open(os.path.join(self.bundle_path, 'workload_gen.py'), 'w') as f:
+            f.write('def run(context):\n    pass\n')
+        with open(os.path.join(self.bundle_path, 'data', 'large.dat'), 'w') as f:
+            f.write('data')
+        self.tar_path = os.path.join(self.tmp_path, 'bundle.tar.gz')
+        with tarfile.open(self.tar_path, 'w:gz') as archive:
+            archive.add(self.bundle_path, 'bundle')
+        self.zip_path = os.path.join(self.tmp_path, 'bundle.zip')
+        with zipfile.ZipFile(self.zip_path, 'w') as archive:
+            archive.write(os.path.join(self.bundle_path, 'workload_gen.py'), 'workload_gen.py')
+        patcher = mock.patch.object(ArchiveCache, 'get_archive_dir')
+        self.addCleanup(patcher.stop)
+        patcher.start().return_value = os.path.join(self.tmp_path, 'archives')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def sha256(self, path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def test_parse_checksum(self):
+        self.assertEqual(ArchiveCache.parse_checksum('SHA1:ABC'), ('sha1', 'abc'))
+        self.assertEqual(ArchiveCache.parse_checksum('abc'), ('sha256', 'abc'))
+        self.assertIsNone(ArchiveCache.parse_checksum(None))
+        with self.assertRaises(ScottyException):
+            ArchiveCache.parse_checksum('crc32:abc')
+
+    def test_get_tar(self):
+        extract_path = ArchiveCache.get('bundle.tar.gz', 'tar', self.tmp_path)
+        self.assertEqual(
+            os.path.basename(extract_path), 'sha256-' + self.sha256(self.tar_path))
+        self.assertTrue(os.path.isfile(os.path.join(extract_path, 'workload_gen.py')))
+        self.assertTrue(os.path.isfile(os.path.join(extract_path, 'data', 'large.dat')))
+
+    def test_get_zip(self):
+        extract_path = ArchiveCache.get('bundle.zip', 'zip', self.tmp_path)
+        self.assertTrue(os.path.isfile(os.path.join(extract_path, 'workload_gen.py')))
+
+    def test_get_cached_by_checksum(self):
+        checksum = 'sha256:' + self.sha256(self.tar_path)
+        extract_path = ArchiveCache.get('bundle.tar.gz', 'tar', self.tmp_path, checksum)
+        os.remove(self.tar_path)
+        self.assertEqual(
+            ArchiveCache.get('bundle.tar.gz', 'tar', self.tmp_path, checksum), extract_path)
+
+    def test_get_checksum_mismatch(self):
+        with self.assertRaises(ScottyException):
+            ArchiveCache.get('bundle.tar.gz', 'tar', self.tmp_path, 'sha256:' + '0' * 64)
+
+    def test_get_download(self):
+        url = 'file://' + self.tar_path
+        extract_path = ArchiveCache.get(url, 'tar', self.tmp_path)
+        self.assertTrue(os.path.isfile(os.path.join(extract_path, 'workload_gen.py')))
+        downloads = os.listdir(os.path.join(self.tmp_path, 'archives', 'downloads'))
+        self.assertEqual(len([name for name in downloads if name.endswith('.tar.gz')]), 1)
+
+    def test_get_unsafe_member(self):
+        unsafe_path = os.path.join(self.tmp_path, 'unsafe.tar')
+        with tarfile.open(unsafe_path, 'w') as archive:
+            archive.add(os.path.join(self.bundle_path, 'workload_gen.py'), '../workload_gen.py')
+        with self.assertRaises(ScottyException):
+            ArchiveCache.get('unsafe.tar', 'tar', self.tmp_path)
+
+    def test_populate_tar_generator(self):
+        component = Component()
+        component.config = {'name': 'demo', 'generator': 'tar:bundle.tar.gz'}
+        workspace = mock.MagicMock()
+        workspace.path = os.path.join(self.tmp_path, 'workspace')
+        CheckoutManager.populate(component, self.tmp_path, workspace)
+        self.assertTrue(os.path.isfile(os.path.join(workspace.path, 'workload_gen.py')))
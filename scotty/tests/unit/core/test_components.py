@@ -1,8 +1,16 @@
+import shutil
+import tempfile
 import unittest
+
 import mock
 
 from scotty.core.checkout import CheckoutManager
 from scotty.core.components import Component
+from scotty.core.components import ComponentFactory
+from scotty.core.components import ComponentValidator
+from scotty.core.components import Workload
+from scotty.core.components import WorkloadInstance
+from scotty.core.exceptions import ScottyException
 
 class CheckoutManagerTest(unittest.TestCase):
     def test_generator_location(self):
@@ -54,3 +62,221 @@ class CheckoutManagerTest(unittest.TestCase):
         component = Component()
         component.config = config
         self.assertEqual(component.generator['type'], "git")
+
+
+class ComponentSourceTest(unittest.TestCase):
+    def _get_component(self, generator, name):
+        component = Workload()
+        component.config = {'name': name, 'generator': generator}
+        return component
+
+    def test_source_key(self):
+        component_1 = self._get_component('file:workload[master]', 'workload_1')
+        component_2 = self._get_component('file:workload[master]', 'workload_2')
+        component_3 = self._get_component('file:workload[other]', 'workload_3')
+        self.assertEqual(component_1.source_key, component_2.source_key)
+        self.assertNotEqual(component_1.source_key, component_3.source_key)
+        self.assertTrue(component_1.source_key.startswith('file-'))
+
+    @mock.patch('scotty.core.components.shutil.rmtree')
+    @mock.patch('scotty.core.components.ComponentStore.compile')
+    @mock.patch('scotty.core.components.ComponentStore.add')
+    @mock.patch('scotty.core.components.CheckoutManager.populate')
+    def test_source_populated_once(self, populate_mock, add_mock, compile_mock, rmtree_mock):
+        add_mock.return_value = '/tmp/store/entry'
+        experiment = mock.MagicMock()
+        experiment.sources = {}
+        experiment.workspace.get_source_path.return_value = '/tmp/source'
+        component_1 = self._get_component('file:workload', 'workload_1')
+        component_2 = self._get_component('file:workload', 'workload_2')
+        source_1 = ComponentFactory._get_component_source(experiment, component_1)
+        source_2 = ComponentFactory._get_component_source(experiment, component_2)
+        self.assertIs(source_1, source_2)
+        self.assertEqual(source_1.path, '/tmp/store/entry')
+        self.assertEqual(populate_mock.call_count, 1)
+        add_mock.assert_called_once_with(experiment.workspace.store_path, '/tmp/source')
+        compile_mock.assert_called_once_with('/tmp/store/entry')
+        rmtree_mock.assert_called_once_with('/tmp/source', ignore_errors=True)
+
+    @mock.patch('scotty.core.components.CheckoutManager.populate')
+    def test_source_populate_error(self, populate_mock):
+        populate_mock.side_effect = ValueError('populate failed')
+        experiment = mock.MagicMock()
+        experiment.sources = {}
+        component_1 = self._get_component('file:workload', 'workload_1')
+        component_2 = self._get_component('file:workload', 'workload_2')
+        with self.assertRaises(ValueError):
+            ComponentFactory._get_component_source(experiment, component_1)
+        with self.assertRaises(ValueError):
+            ComponentFactory._get_component_source(experiment, component_2)
+        self.assertEqual(populate_mock.call_count, 1)
+
+
+class ComponentValidatorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.workload = Workload()
+        self.workload.config = {'name': 'workload'}
+        self.workload.workspace = mock.Mock(path=self.tmp_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def write_module(self, source):
+        with open(self.workload.module_path, 'w') as f:
+            f.write(source)
+
+    def test_validate_interfaces(self):
+        self.write_module('import heavy_module\n\ndef run(context):\n    pass\n')
+        ComponentValidator.validate_interfaces(self.workload)
+        self.assertEqual(self.workload.coroutine_interfaces, set())
+        self.assertFalse(self.workload.module_loaded)
+
+    def test_validate_interfaces_missing(self):
+        self.write_module('def deploy(context):\n    pass\n')
+        with self.assertRaises(ScottyException):
+            ComponentValidator.validate_interfaces(self.workload)
+
+    def test_validate_interfaces_syntax_error(self):
+        self.write_module('def run(context)\n')
+        with self.assertRaises(ScottyException):
+            ComponentValidator.validate_interfaces(self.workload)
+
+    def test_validate_interfaces_import_and_assign(self):
+        self.write_module(
+            'try:\n    from helper import run\nexcept ImportError:\n    run = None\n')
+        ComponentValidator.validate_interfaces(self.workload)
+
+    def test_validate_interfaces_coroutine(self):
+        self.write_module('import trollius\n\n@trollius.coroutine\ndef run(context):\n    pass\n')
+        ComponentValidator.validate_interfaces(self.workload)
+        self.assertEqual(self.workload.coroutine_interfaces, set(['run']))
+
+    def test_validate_interfaces_coroutine_call(self):
+        self.write_module(
+            'import trollius\n\ndef _run(context):\n    pass\n\nrun = trollius.coroutine(_run)\n')
+        ComponentValidator.validate_interfaces(self.workload)
+        self.assertEqual(self.workload.coroutine_interfaces, set(['run']))
+
+
+class ComponentModuleTest(unittest.TestCase):
+    @mock.patch('scotty.core.components.ModuleLoader')
+    def test_module_loaded_lazily(self, module_loader_mock):
+        workload = Workload()
+        self.assertFalse(workload.module_loaded)
+        module_loader_mock.load_by_component.assert_not_called()
+        self.assertIs(workload.module, module_loader_mock.load_by_component.return_value)
+        self.assertIs(workload.module, module_loader_mock.load_by_component.return_value)
+        module_loader_mock.load_by_component.assert_called_once_with(workload)
+        workload.unload_module()
+        module_loader_mock.unload.assert_called_once_with(
+            module_loader_mock.load_by_component.return_value)
+        self.assertFalse(workload.module_loaded)
+
+
+class WorkloadMatrixTest(unittest.TestCase):
+    def _workload(self, **config):
+        workload = Workload()
+        workload.config = dict(
+            {'name': 'workload', 'params': {'threads': 1, 'user': 'me'}}, **config)
+        return workload
+
+    def test_iter_matrix(self):
+        workload = self._workload(matrix={'threads': [1, 2], 'payload': ['1k']})
+        self.assertEqual(list(workload.iter_matrix()), [
+            (('payload', '1k'), ('threads', 1)),
+            (('payload', '1k'), ('threads', 2))])
+
+    def test_matrix_concurrency(self):
+        self.assertEqual(self._workload().matrix_concurrency, 1)
+        self.assertEqual(self._workload(matrix_concurrency=4).matrix_concurrency, 4)
+        self.assertTrue(self._workload(matrix_concurrency='unbounded').matrix_concurrency > 1000)
+        with self.assertRaises(ScottyException):
+            self._workload(matrix_concurrency='fast').matrix_concurrency
+
+    def test_validate_matrix(self):
+        ComponentValidator.validate_matrix(self._workload(matrix={'threads': [1, 2]}))
+        for matrix in [{'threads': []}, {'threads': 1}, {'threads': [[1]]}, ['threads']]:
+            with self.assertRaises(ScottyException):
+                ComponentValidator.validate_matrix(self._workload(matrix=matrix))
+
+    def test_workload_instance(self):
+        workload = self._workload(matrix={'threads': [2]})
+        workload.module = mock.Mock()
+        instance = WorkloadInstance(workload, {'threads': 2}, (('threads', 2),))
+        self.assertEqual(instance.type, 'workload')
+        self.assertEqual(instance.name, 'workload')
+        self.assertEqual(instance.params, {'threads': 2, 'user': 'me'})
+        self.assertEqual(workload.params, {'threads': 1, 'user': 'me'})
+        self.assertIs(instance.module, workload.module)
+
+    def test_repetitions(self):
+        workload = self._workload(repetitions=5, warmup=2)
+        self.assertEqual((workload.repetitions, workload.warmup), (5, 2))
+        self.assertTrue(workload.planned)
+        self.assertFalse(self._workload().planned)
+        for config in [{'repetitions': 0}, {'warmup': -1}, {'confidence': 0.5}]:
+            with self.assertRaises(ScottyException):
+                ComponentValidator.validate_run_plan(self._workload(**config))
+
+    def test_convergence(self):
+        workload = self._workload(convergence={
+            'metric': 'throughput', 'relative_error': 0.05, 'max_time': '10m'})
+        self.assertEqual(workload.convergence, {
+            'metric': 'throughput', 'relative_error': 0.05, 'min_repetitions': 3,
+            'max_repetitions': None, 'max_time': 600})
+        self.assertTrue(workload.planned)
+        self.assertIsNone(self._workload().convergence)
+        invalid = [
+            {'relative_error': 0.05},
+            {'relative_error': 0, 'max_repetitions': 10},
+            {'relative_error': 0.05, 'max_repetitions': 2, 'min_repetitions': 3},
+            {'relative_error': 0.05, 'max_time': 'soon'},
+        ]
+        for convergence in invalid:
+            with self.assertRaises(ScottyException):
+                ComponentValidator.validate_run_plan(self._workload(convergence=convergence))
+        with self.assertRaises(ScottyException):
+            self._workload(repetitions=3, convergence={
+                'relative_error': 0.05, 'max_repetitions': 10}).convergence
+
+    def test_search(self):
+        workload = self._workload(search={
+            'param': 'threads', 'metric': 'p99', 'slo': 0.2, 'start': 1})
+        search = workload.search
+        self.assertEqual((search['factor'], search['resolution'], search['max']), (2, 1, None))
+        self.assertTrue(search['integer'])
+        self.assertTrue(workload.planned)
+        search = self._workload(search={
+            'param': 'rate', 'metric': 'p99', 'slo': 0.2, 'start': 10.0}).search
+        self.assertFalse(search['integer'])
+        self.assertEqual(search['resolution'], 0.1)
+        invalid = [
+            {'metric': 'p99', 'slo': 0.2, 'start': 1},
+            {'param': 'threads', 'metric': 'p99', 'start': 1},
+            {'param': 'threads', 'metric': 'p99', 'slo': 0.2, 'start': 0},
+            {'param': 'threads', 'metric': 'p99', 'slo': 0.2, 'start': 1, 'factor': 1},
+            {'param': 'threads', 'metric': 'p99', 'slo': 0.2, 'start': 4, 'max': 2},
+        ]
+        for search in invalid:
+            with self.assertRaises(ScottyException):
+                ComponentValidator.validate_run_plan(self._workload(search=search))
+        with self.assertRaises(ScottyException):
+            self._workload(matrix={'threads': [1, 2]}, search={
+                'param': 'threads', 'metric': 'p99', 'slo': 0.2, 'start': 1}).search
+
+    def test_replicas(self):
+        workload = self._workload(replicas=3, reducer={'throughput': 'sum'})
+        self.assertEqual(workload.replicas, 3)
+        self.assertTrue(workload.planned)
+        self.assertEqual(self._workload().reducer, 'list')
+        for config in [{'replicas': 0}, {'reducer': 1}, {'reducer': {'throughput': 1}}]:
+            with self.assertRaises(ScottyException):
+                ComponentValidator.validate_run_plan(self._workload(**config))
+
+    @mock.patch('scotty.core.components.ComponentValidator._get_module_functions')
+    def test_validate_reducer(self, get_module_functions_mock):
+        get_module_functions_mock.return_value = ({'run': False, 'merge': False}, False)
+        ComponentValidator.validate_reducer(self._workload(reducer={'a': 'sum', 'b': 'merge'}))
+        with self.assertRaises(ScottyException):
+            ComponentValidator.validate_reducer(self._workload(reducer='missing'))
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import yaml
+
+from scotty.core.configloader import ConfigLoader
+
+
+class ConfigLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.tmp_path, 'experiment.yaml')
+        self.write("name: experiment\nparams:\n  user: <%= ENV['scotty_user'] %>\n")
+        ConfigLoader.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+        ConfigLoader.clear()
+
+    def write(self, content):
+        with open(self.config_path, 'w') as f:
+            f.write(content)
+
+    @mock.patch.dict(os.environ, {'scotty_user': 'myuser'})
+    def test_load_env(self):
+        config = ConfigLoader.load(self.config_path)
+        self.assertEqual(config, {'name': 'experiment', 'params': {'user': 'myuser'}})
+
+    def test_load_env_missing(self):
+        with mock.patch.dict(os.environ, clear=True):
+            config = ConfigLoader.load(self.config_path)
+        self.assertEqual(config['params']['user'], '')
+
+    def test_global_resolvers_untouched(self):
+        resolvers = dict(yaml.SafeLoader.yaml_implicit_resolvers)
+        ConfigLoader.load(self.config_path)
+        ConfigLoader.clear()
+        ConfigLoader.load(self.config_path)
+        self.assertEqual(yaml.SafeLoader.yaml_implicit_resolvers, resolvers)
+        loader_resolvers = ConfigLoader._get_loader_class().yaml_implicit_resolvers['<']
+        env_resolvers = [tag for tag, _ in loader_resolvers if tag == ConfigLoader.env_tag]
+        self.assertEqual(len(env_resolvers), 1)
+
+    def test_safe_load(self):
+        self.write("name: !!python/object/apply:os.getcwd []\n")
+        with self.assertRaises(yaml.YAMLError):
+            ConfigLoader.load(self.config_path)
+
+    @mock.patch.dict(os.environ, {'scotty_user': 'myuser'})
+    def test_load_cached(self):
+        config = ConfigLoader.load(self.config_path)
+        config['name'] = 'changed'
+        with mock.patch.object(ConfigLoader, '_parse') as parse_mock:
+            cached_config = ConfigLoader.load(self.config_path)
+            parse_mock.assert_not_called()
+        self.assertEqual(cached_config['name'], 'experiment')
+
+    def test_load_cache_invalidated_by_env(self):
+        with mock.patch.dict(os.environ, {'scotty_user': 'myuser'}):
+            ConfigLoader.load(self.config_path)
+        with mock.patch.dict(os.environ, {'scotty_user': 'otheruser'}):
+            config = ConfigLoader.load(self.config_path)
+        self.assertEqual(config['params']['user'], 'otheruser')
+
+    def test_load_cache_invalidated_by_change(self):
+        ConfigLoader.load(self.config_path)
+        self.write("name: other_experiment\n")
+        os.utime(self.config_path, (0, 0))
+        self.assertEqual(ConfigLoader.load(self.config_path), {'name': 'other_experiment'})
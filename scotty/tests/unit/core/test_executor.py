@@ -1,11 +1,27 @@
+import pickle
+import threading
+import time
 import unittest
 import mock
 
+from concurrent import futures
 from concurrent.futures import wait as futures_wait
 
+from scotty.core import executor
 from scotty.core.executor import ComponentExecutor
+from scotty.core.executor import ConcurrencyLimits
 from scotty.core.executor import WorkloadRunExecutor
 from scotty.core.executor import ResourceDeployExecutor
+from scotty.core.executor import ResourceReleaseExecutor
+from scotty.core.executor import SystemCollectorCollectExecutor
+from scotty.core.executor import _exec_in_process
+from scotty.core.executor import asyncio
+from scotty.core.components import CommonComponentState
+from scotty.core.components import Experiment
+from scotty.core.components import Resource
+from scotty.core.components import Workload
+from scotty.core.context import ComponentSnapshot
+from scotty.core.context import ExperimentSnapshot
 from scotty.core.exceptions import ScottyException
 
 class ComponentExecutorTest(unittest.TestCase):
@@ -53,13 +69,78 @@ class ComponentExecutorTest(unittest.TestCase):
         component_executor._log_component_exception(component_mock)
         logger_exception_mock.assert_called()
 
+    @unittest.skipIf(asyncio is None, 'requires asyncio or trollius')
+    def test_submit_coroutine(self):
+        @asyncio.coroutine
+        def run(context):
+            return context.v1.workload.name
+        experiment = Experiment()
+        workload = Workload()
+        workload.config = {'name': 'workload'}
+        workload.module = mock.Mock(run=run)
+        component_executor = ComponentExecutor()
+        future = component_executor.submit(experiment, workload, 'run')
+        self.assertEqual(future.result(timeout=5), 'workload')
+        self.assertEqual(workload.state, CommonComponentState.COMPLETED)
+        self.assertEqual(len(component_executor._threads), 0)
+
+    @unittest.skipIf(asyncio is None, 'requires asyncio or trollius')
+    @mock.patch('scotty.core.components.ModuleLoader.load_by_component')
+    def test_submit_coroutine_loads_module_in_submit_thread(self, load_by_component_mock):
+        @asyncio.coroutine
+        def run(context):
+            return context.v1.workload.name
+        load_threads = []
+
+        def load_by_component(component):
+            load_threads.append(threading.current_thread())
+            return mock.Mock(run=run)
+        load_by_component_mock.side_effect = load_by_component
+        experiment = Experiment()
+        workload = Workload()
+        workload.config = {'name': 'workload'}
+        workload.coroutine_interfaces.add('run')
+        component_executor = ComponentExecutor()
+        future = component_executor.submit(experiment, workload, 'run')
+        self.assertEqual(future.result(timeout=5), 'workload')
+        self.assertEqual(load_threads, [threading.current_thread()])
+        self.assertEqual(len(component_executor._threads), 0)
+
+    @unittest.skipIf(asyncio is None, 'requires asyncio or trollius')
+    @mock.patch('scotty.core.components.ModuleLoader.load_by_component')
+    def test_exec_undetected_coroutine(self, load_by_component_mock):
+        @asyncio.coroutine
+        def run(context):
+            return context.v1.workload.name
+        load_by_component_mock.return_value = mock.Mock(run=run)
+        experiment = Experiment()
+        workload = Workload()
+        workload.config = {'name': 'workload'}
+        component_executor = ComponentExecutor()
+        future = component_executor.submit(experiment, workload, 'run')
+        self.assertEqual(future.result(timeout=5), 'workload')
+        self.assertEqual(workload.state, CommonComponentState.COMPLETED)
+
+    @mock.patch('scotty.core.components.ModuleLoader.load_by_component')
+    def test_exec_import_error(self, load_by_component_mock):
+        load_by_component_mock.side_effect = ImportError('heavy_module')
+        experiment = Experiment()
+        workload = Workload()
+        workload.config = {'name': 'workload'}
+        component_executor = ComponentExecutor()
+        future = component_executor.submit(experiment, workload, 'run')
+        self.assertIsNone(future.result(timeout=5))
+        self.assertEqual(workload.state, CommonComponentState.ERROR)
+        self.assertTrue(experiment.has_errors())
+
+
 class WorkloadExecutorTest(unittest.TestCase):
     @mock.patch('scotty.core.executor.ComponentExecutor.submit')
     @mock.patch('scotty.core.components.Experiment')
     def test_submit_workloads(self, experiment_mock, submit_mock):
         workloads_mock = {}
-        workloads_mock['workload_1'] = mock.Mock()
-        workloads_mock['workload_2'] = mock.Mock()
+        workloads_mock['workload_1'] = mock.Mock(planned=False)
+        workloads_mock['workload_2'] = mock.Mock(planned=False)
         experiment_mock.components = {}
         experiment_mock.components['workload'] = workloads_mock
         workload_run_executor = WorkloadRunExecutor()
@@ -69,6 +150,293 @@ class WorkloadExecutorTest(unittest.TestCase):
     def test_collect_results(self):
         pass
 
+    @mock.patch('scotty.core.executor.ComponentExecutor._exec_with_context')
+    def test_collect_results_waits_for_release(self, _exec_with_context_mock):
+        released = []
+        def release_workload(workload):
+            time.sleep(0.2)
+            released.append(workload)
+        resource_release_executor = mock.Mock()
+        resource_release_executor.release_workload.side_effect = release_workload
+        workload = mock.Mock(planned=False)
+        workload.config = {'resources': {}}
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {'workload': {'workload': workload}}
+        workload_run_executor = WorkloadRunExecutor(
+            resource_release_executor=resource_release_executor)
+        workload_run_executor.submit_workloads(experiment_mock)
+        workload_run_executor.collect_results()
+        self.assertEqual(released, [workload])
+
+    @mock.patch('scotty.core.executor.ComponentExecutor.submit')
+    def test_submit_workloads_waits_for_own_resources(self, submit_mock):
+        deployed_future = futures.Future()
+        pending_future = futures.Future()
+        resource_deploy_executor = mock.Mock()
+        resource_deploy_executor.get_future.side_effect = {
+            'resource_1': deployed_future,
+            'resource_2': pending_future}.get
+        workload_1 = mock.Mock(planned=False)
+        workload_1.config = {'resources': {'res': 'resource_1'}}
+        workload_2 = mock.Mock(planned=False)
+        workload_2.config = {'resources': {'res': 'resource_2'}}
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {
+            'workload': {'workload_1': workload_1, 'workload_2': workload_2}}
+        deployed_future.set_result('endpoint')
+        workload_run_executor = WorkloadRunExecutor()
+        workload_run_executor.submit_workloads(experiment_mock, resource_deploy_executor)
+        submit_mock.assert_called_once_with(experiment_mock, workload_1, 'run')
+        pending_future.set_result('endpoint')
+        submit_mock.assert_called_with(experiment_mock, workload_2, 'run')
+        self.assertEqual(submit_mock.call_count, 2)
+
+    @mock.patch('scotty.core.executor.ComponentExecutor.submit')
+    def test_submit_workloads_waits_for_systemcollectors(self, submit_mock):
+        systemcollector_collect_executor = mock.Mock()
+        collected_future = futures.Future()
+        systemcollector_collect_executor.get_future.return_value = collected_future
+        workload = mock.Mock(planned=False)
+        workload.config = {'resources': {}}
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {'workload': {'workload': workload}}
+        workload_run_executor = WorkloadRunExecutor()
+        workload_run_executor.submit_workloads(
+            experiment_mock,
+            systemcollector_collect_executor=systemcollector_collect_executor)
+        submit_mock.assert_not_called()
+        collected_future.set_result(None)
+        submit_mock.assert_called_once_with(experiment_mock, workload, 'run')
+
+
+class WorkloadRunTestCase(unittest.TestCase):
+    def _run_workload(self, run, resource_release_executor=None, **config):
+        """Run a workload with the run function and config, returns workload and experiment"""
+        workload = Workload()
+        workload.config = dict({'name': 'workload', 'params': {}, 'resources': {}}, **config)
+        workload.module = mock.Mock(run=run)
+        experiment = Experiment()
+        experiment.add_component(workload)
+        workload_run_executor = WorkloadRunExecutor(
+            resource_release_executor=resource_release_executor)
+        workload_run_executor.submit_workloads(experiment)
+        workload_run_executor.collect_results()
+        return workload, experiment
+
+
+class WorkloadMatrixTest(WorkloadRunTestCase):
+    def _run(self, run, matrix, matrix_concurrency='serial'):
+        return self._run_workload(
+            run,
+            params={'greeting': 'Hallo', 'threads': 0},
+            matrix=matrix,
+            matrix_concurrency=matrix_concurrency)
+
+    def test_run_matrix(self):
+        def run(context):
+            params = context.v1.workload.params
+            return '{greeting} {threads} {payload}'.format(**params)
+        workload, experiment = self._run(run, {'threads': [1, 2], 'payload': ['1k', '64k']})
+        self.assertEqual(workload.result.keys(), [
+            (('payload', '1k'), ('threads', 1)),
+            (('payload', '1k'), ('threads', 2)),
+            (('payload', '64k'), ('threads', 1)),
+            (('payload', '64k'), ('threads', 2))])
+        self.assertEqual(workload.result[(('payload', '64k'), ('threads', 2))], 'Hallo 2 64k')
+        run_ = workload.runs[(('payload', '1k'), ('threads', 1))]
+        self.assertEqual(run_['params'], {'payload': '1k', 'threads': 1})
+        self.assertEqual(run_['state'], CommonComponentState.COMPLETED)
+        self.assertEqual(workload.state, CommonComponentState.COMPLETED)
+        self.assertEqual(workload.params['threads'], 0)
+        self.assertFalse(experiment.has_errors())
+
+    def _max_running(self, matrix_concurrency):
+        lock = threading.Lock()
+        running = [0, 0]
+        def run(context):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+        workload, experiment = self._run(run, {'threads': [1, 2, 3, 4, 5, 6]}, matrix_concurrency)
+        self.assertEqual(len(workload.result), 6)
+        return running[1]
+
+    def test_run_matrix_serial(self):
+        self.assertEqual(self._max_running('serial'), 1)
+
+    def test_run_matrix_concurrency(self):
+        self.assertEqual(self._max_running(3), 3)
+
+    def test_run_matrix_error(self):
+        def run(context):
+            if context.v1.workload.params['threads'] == 2:
+                raise ValueError()
+        workload, experiment = self._run(run, {'threads': [1, 2]})
+        self.assertEqual(workload.state, CommonComponentState.ERROR)
+        self.assertEqual(workload.runs[(('threads', 1),)]['state'], CommonComponentState.COMPLETED)
+        self.assertTrue(experiment.has_errors())
+
+
+class WorkloadRepetitionTest(WorkloadRunTestCase):
+    def test_run_repetitions(self):
+        calls = []
+        def run(context):
+            workload = context.v1.workload
+            calls.append((workload.repetition, workload.warmup_run))
+            return {'throughput': 100 * (workload.repetition + 1)}
+        workload, experiment = self._run_workload(run, repetitions=3, warmup=1)
+        self.assertEqual(calls, [(0, True), (0, False), (1, False), (2, False)])
+        self.assertEqual(len(workload.result), 3)
+        run_ = workload.runs[()]
+        self.assertEqual(len(run_['samples']), 3)
+        self.assertEqual(run_['summary']['result']['throughput']['mean'], 200.0)
+        self.assertEqual(run_['summary']['duration']['n'], 3)
+        self.assertEqual(list(run_['values']['result']['throughput']), [100, 200, 300])
+        self.assertEqual(workload.state, CommonComponentState.COMPLETED)
+
+
+class WorkloadConvergenceTest(WorkloadRunTestCase):
+    def _run(self, results, **convergence):
+        results = iter(results)
+        workload, experiment = self._run_workload(
+            lambda context: next(results),
+            convergence=dict({'relative_error': 0.05, 'max_repetitions': 10}, **convergence))
+        return workload.runs[()]
+
+    def test_converged(self):
+        run = self._run([100, 101, 99, 100] * 3)
+        self.assertEqual(run['stop_reason'], 'converged')
+        self.assertEqual(len(run['samples']), 3)
+        self.assertLess(run['relative_error'], 0.05)
+
+    def test_metric(self):
+        results = [{'latency': 1, 'throughput': value} for value in [100, 100, 100]]
+        run = self._run(results, metric='throughput', min_repetitions=2)
+        self.assertEqual(run['stop_reason'], 'converged')
+        self.assertEqual(len(run['samples']), 2)
+
+    def test_max_repetitions(self):
+        run = self._run([10, 100] * 5, max_repetitions=6)
+        self.assertEqual(run['stop_reason'], 'max_repetitions')
+        self.assertEqual(len(run['samples']), 6)
+        self.assertGreater(run['relative_error'], 0.05)
+
+    def test_max_time(self):
+        with mock.patch.object(executor, 'time') as time_:
+            time_.time.side_effect = [0, 30, 60, 90]
+            run = self._run([10, 100] * 5, max_time='60s', max_repetitions=None)
+        self.assertEqual(run['stop_reason'], 'max_time')
+        self.assertEqual(len(run['samples']), 2)
+
+    def test_invalid_metric(self):
+        run = self._run(['ok'] * 5)
+        self.assertEqual(run['stop_reason'], 'invalid_metric')
+        self.assertEqual(len(run['samples']), 1)
+        self.assertIsNone(run['relative_error'])
+
+
+class WorkloadSearchTest(WorkloadRunTestCase):
+    def _search(self, knee, **search):
+        def run(context):
+            rate = context.v1.workload.params['rate']
+            return {'p99': 0.1 * rate / knee}
+        resource_release_executor = mock.Mock()
+        workload, experiment = self._run_workload(
+            run,
+            resource_release_executor,
+            params={'rate': 0},
+            search=dict({'param': 'rate', 'metric': 'p99', 'slo': 0.1, 'start': 1}, **search))
+        resource_release_executor.release_workload.assert_called_once_with(workload)
+        return workload
+
+    def test_search(self):
+        workload = self._search(37)
+        result = workload.result
+        self.assertEqual(result['knee'], 37)
+        self.assertEqual(result['limit'], 38)
+        self.assertEqual(result['stop_reason'], 'resolution_reached')
+        self.assertEqual(
+            [probe['value'] for probe in result['probes']],
+            [1, 2, 4, 8, 16, 32, 64, 48, 40, 36, 38, 37])
+        self.assertEqual(
+            [probe['passed'] for probe in result['probes']],
+            [True] * 6 + [False] * 3 + [True, False, True])
+        self.assertEqual(len(workload.runs), 12)
+        self.assertEqual(workload.runs[(('rate', 64),)]['result'], {'p99': 0.1 * 64 / 37})
+        self.assertEqual(workload.state, CommonComponentState.COMPLETED)
+
+    def test_search_float(self):
+        result = self._search(3.3, start=1.0, resolution=0.05).result
+        self.assertLessEqual(result['knee'], 3.3)
+        self.assertLessEqual(result['limit'] - result['knee'], 0.05)
+
+    def test_search_max(self):
+        result = self._search(100, max=20).result
+        self.assertEqual(result['stop_reason'], 'max_reached')
+        self.assertEqual([probe['value'] for probe in result['probes']], [1, 2, 4, 8, 16, 20])
+        self.assertEqual(result['knee'], 20)
+
+    def test_search_start_failed(self):
+        result = self._search(0.5).result
+        self.assertEqual(result['stop_reason'], 'start_failed')
+        self.assertIsNone(result['knee'])
+        self.assertEqual(len(result['probes']), 1)
+
+    def test_search_max_probes(self):
+        result = self._search(37, max_probes=8).result
+        self.assertEqual(result['stop_reason'], 'max_probes')
+        self.assertEqual((result['knee'], result['limit']), (32, 48))
+
+
+class WorkloadReplicasTest(WorkloadRunTestCase):
+    def _run(self, run, replicas, **config):
+        workload, experiment = self._run_workload(run, replicas=replicas, **config)
+        return workload
+
+    def test_replicas(self):
+        replicas = []
+        def run(context):
+            workload = context.v1.workload
+            replicas.append(workload.replica)
+            return {'throughput': 10 * (workload.replica + 1), 'latency': {'0.1': 1}}
+        workload = self._run(run, 3, reducer={'throughput': 'sum', 'latency': 'histogram'})
+        self.assertEqual(sorted(replicas), [0, 1, 2])
+        self.assertEqual(workload.result, {'throughput': 60, 'latency': {'0.1': 3}})
+        self.assertEqual(len(workload.runs[()]['samples'][0]['replicas']), 3)
+        self.assertEqual(workload.state, CommonComponentState.COMPLETED)
+
+    def test_replicas_concurrent(self):
+        # more replicas than workers of the run phase have to start at once
+        started = threading.Event()
+        lock = threading.Lock()
+        running = []
+        def run(context):
+            with lock:
+                running.append(context.v1.workload.replica)
+                if len(running) == 8:
+                    started.set()
+            return started.wait(10)
+        workload = self._run(run, 8)
+        self.assertEqual(workload.result, [True] * 8)
+
+    def test_replicas_error(self):
+        def run(context):
+            if context.v1.workload.replica == 1:
+                raise Exception('replica failed')
+            return 1
+        workload = self._run(run, 3, reducer='sum')
+        sample = workload.runs[()]['samples'][0]
+        self.assertEqual(sample['state'], CommonComponentState.ERROR)
+        self.assertEqual(sample['result'], 2)
+        self.assertEqual(workload.state, CommonComponentState.ERROR)
+
+    def test_replicas_repetitions(self):
+        workload = self._run(lambda context: 5, 4, reducer='sum', repetitions=2)
+        self.assertEqual(workload.result, [20, 20])
+        self.assertEqual(workload.runs[()]['summary']['result']['mean'], 20.0)
 
 class ResourceDeployExecutorTest(unittest.TestCase):
     @mock.patch('scotty.core.executor.ComponentExecutor.submit')
@@ -82,3 +450,181 @@ class ResourceDeployExecutorTest(unittest.TestCase):
         resource_deploy_executor = ResourceDeployExecutor()
         resource_deploy_executor.submit_resources(experiment_mock)
         submit_mock.assert_called()
+
+
+    @mock.patch('scotty.core.executor.ComponentExecutor._exec_interface')
+    def test_endpoint_set_before_done(self, _exec_interface_mock):
+        _exec_interface_mock.return_value = 'endpoint'
+        resource = mock.Mock(executor='thread', endpoint=None)
+        resource.name = 'resource_1'
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {'resource': {'resource_1': resource}}
+        resource_deploy_executor = ResourceDeployExecutor()
+        resource_deploy_executor.submit_resources(experiment_mock)
+        futures_wait([resource_deploy_executor.get_future('resource_1')])
+        self.assertEqual(resource.endpoint, 'endpoint')
+
+
+class SystemCollectorCollectExecutorTest(unittest.TestCase):
+    @mock.patch('scotty.core.executor.ComponentExecutor.submit')
+    def test_submit_after_deploy(self, submit_mock):
+        deploy_future = futures.Future()
+        resource_deploy_executor = mock.Mock()
+        resource_deploy_executor.get_futures.return_value = [deploy_future]
+        systemcollector = mock.Mock()
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {'systemcollector': {'collector': systemcollector}}
+        systemcollector_collect_executor = SystemCollectorCollectExecutor()
+        systemcollector_collect_executor.submit_systemcollectors(
+            experiment_mock, resource_deploy_executor)
+        submit_mock.assert_not_called()
+        deploy_future.set_result('endpoint')
+        submit_mock.assert_called_once_with(experiment_mock, systemcollector, 'collect')
+        systemcollector_collect_executor.wait()
+
+    @mock.patch('scotty.core.executor.ComponentExecutor._exec_with_context')
+    def test_future_done_after_collect(self, _exec_with_context_mock):
+        collect_event = threading.Event()
+        _exec_with_context_mock.side_effect = lambda *args: collect_event.wait(5)
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {'systemcollector': {'collector': mock.Mock()}}
+        systemcollector_collect_executor = SystemCollectorCollectExecutor()
+        systemcollector_collect_executor.submit_systemcollectors(experiment_mock)
+        collected_future = systemcollector_collect_executor.get_future()
+        self.assertFalse(collected_future.done())
+        collect_event.set()
+        collected_future.result(timeout=5)
+
+
+class ResourceReleaseExecutorTest(unittest.TestCase):
+    def _done_future(self, *args):
+        future = futures.Future()
+        future.set_result(None)
+        return future
+
+    @mock.patch('scotty.core.executor.ResourceCleanExecutor.submit_resource')
+    @mock.patch('scotty.core.executor.WorkloadCleanExecutor.submit_workload')
+    def test_release_after_last_workload(self, submit_workload_mock, submit_resource_mock):
+        submit_workload_mock.side_effect = self._done_future
+        workload_1 = mock.Mock()
+        workload_1.config = {'resources': {'res': 'resource_1'}}
+        workload_2 = mock.Mock()
+        workload_2.config = {'resources': {'res': 'resource_1'}}
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {
+            'resource': {'resource_1': 'resource_1', 'resource_2': 'resource_2'},
+            'workload': {'workload_1': workload_1, 'workload_2': workload_2}}
+        resource_release_executor = ResourceReleaseExecutor(experiment_mock)
+        resource_release_executor.release_workload(workload_1)
+        submit_resource_mock.assert_not_called()
+        resource_release_executor.release_workload(workload_2)
+        submit_resource_mock.assert_called_once_with(experiment_mock, 'resource_1')
+        resource_release_executor.wait()
+        submit_resource_mock.assert_called_with(experiment_mock, 'resource_2')
+        self.assertEqual(submit_resource_mock.call_count, 2)
+
+    @mock.patch('scotty.core.executor.ResourceCleanExecutor.submit_resource')
+    @mock.patch('scotty.core.executor.WorkloadCleanExecutor.submit_workload')
+    def test_release_after_systemcollectors(self, submit_workload_mock, submit_resource_mock):
+        submit_workload_mock.side_effect = self._done_future
+        collected_future = futures.Future()
+        systemcollector_collect_executor = mock.Mock()
+        systemcollector_collect_executor.get_future.return_value = collected_future
+        workload = mock.Mock()
+        workload.config = {'resources': {'res': 'resource_1'}}
+        experiment_mock = mock.Mock()
+        experiment_mock.components = {
+            'resource': {'resource_1': 'resource_1'},
+            'workload': {'workload': workload}}
+        resource_release_executor = ResourceReleaseExecutor(
+            experiment_mock,
+            systemcollector_collect_executor=systemcollector_collect_executor)
+        resource_release_executor.release_workload(workload)
+        submit_resource_mock.assert_not_called()
+        collected_future.set_result(None)
+        submit_resource_mock.assert_called_once_with(experiment_mock, 'resource_1')
+        resource_release_executor.wait()
+        self.assertEqual(submit_resource_mock.call_count, 1)
+
+
+class ConcurrencyLimitsTest(unittest.TestCase):
+    def _experiment(self, concurrency):
+        experiment_mock = mock.Mock()
+        experiment_mock.config = {'concurrency': concurrency}
+        return experiment_mock
+
+    def test_get_max_workers_component_type_before_phase(self):
+        experiment_mock = self._experiment({'clean': 3, 'workload.clean': 2})
+        concurrency = ConcurrencyLimits(experiment_mock)
+        self.assertEqual(concurrency.get_max_workers('workload', 'clean'), 2)
+        self.assertEqual(concurrency.get_max_workers('resource', 'clean'), 3)
+
+    def test_get_max_workers_unbounded(self):
+        experiment_mock = self._experiment({'run': 'unbounded'})
+        concurrency = ConcurrencyLimits(experiment_mock)
+        self.assertTrue(concurrency.get_max_workers('workload', 'run') > 1000)
+
+    def test_get_max_workers_invalid(self):
+        experiment_mock = self._experiment({'run': 0})
+        concurrency = ConcurrencyLimits(experiment_mock)
+        with self.assertRaises(ScottyException):
+            concurrency.get_max_workers('workload', 'run')
+
+    def test_process_pool_unbounded(self):
+        concurrency = ConcurrencyLimits(self._experiment({'processes': 'unbounded'}))
+        with self.assertRaises(ScottyException):
+            concurrency.get_process_pool()
+
+    def test_limit_resource_type(self):
+        experiment_mock = self._experiment({'resource_types': {'openstack': 1}})
+        concurrency = ConcurrencyLimits(experiment_mock)
+        resource_mock = mock.Mock()
+        resource_mock.type = 'resource'
+        resource_mock.config = {'type': 'openstack', 'generator': 'file:resource/demo'}
+        semaphore = concurrency._get_semaphore(resource_mock)
+        with concurrency.limit(resource_mock):
+            self.assertFalse(semaphore.acquire(False))
+        self.assertTrue(semaphore.acquire(False))
+
+    @unittest.skipIf(asyncio is None, 'requires asyncio or trollius')
+    def test_limit_resource_type_coroutine(self):
+        running = []
+        max_running = []
+
+        @asyncio.coroutine
+        def deploy(context):
+            running.append(context)
+            max_running.append(len(running))
+            yield asyncio.From(asyncio.sleep(0.1))
+            running.remove(context)
+        experiment = Experiment()
+        experiment.config = {'concurrency': {'resource_types': {'openstack': 1}}}
+        resource_deploy_executor = ResourceDeployExecutor(ConcurrencyLimits(experiment))
+        deploy_futures = []
+        for name in ['resource_1', 'resource_2']:
+            resource = Resource()
+            resource.config = {
+                'name': name, 'generator': 'file:resource/demo', 'type': 'openstack'}
+            resource.module = mock.Mock(deploy=deploy)
+            deploy_futures.append(resource_deploy_executor.submit(experiment, resource, 'deploy'))
+        futures_wait(deploy_futures, timeout=5)
+        self.assertEqual(max_running, [1, 1])
+        self.assertEqual(len(resource_deploy_executor._threads), 0)
+
+
+class ExecInProcessTest(unittest.TestCase):
+    @mock.patch('scotty.core.executor.ModuleLoader.load_by_path')
+    def test__exec_in_process(self, load_by_path_mock):
+        load_by_path_mock.return_value.run.return_value = 'result'
+        experiment = Experiment()
+        workload = Workload()
+        workload.config = {'name': 'workload', 'params': {}, 'resources': {}}
+        workload.workspace = mock.Mock(path='/tmp/workload')
+        experiment.add_component(workload)
+        component_snapshot = pickle.loads(pickle.dumps(ComponentSnapshot(workload)))
+        experiment_snapshot = pickle.loads(pickle.dumps(ExperimentSnapshot(experiment)))
+        report = _exec_in_process(component_snapshot, experiment_snapshot, 'run')
+        self.assertEqual(report['result'], 'result')
+        self.assertEqual(report['state'], CommonComponentState.COMPLETED)
+        context = load_by_path_mock.return_value.run.call_args[0][0]
+        self.assertEqual(context.v1.workload.name, 'workload')
@@ -0,0 +1,84 @@
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import unittest
+
+from scotty.core.moduleloader import ModuleLoader
+
+
+class ModuleLoaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        for name in ['workload_1', 'workload_2']:
+            path = os.path.join(self.tmp_path, name)
+            os.makedirs(path)
+            self.write(name, 'workload_helper.py', 'value = 42\n')
+            self.write(name, 'workload_gen.py',
+                       'import workload_helper\n\n'
+                       'def run(context):\n'
+                       '    return workload_helper.value\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def write(self, dir_, name, content):
+        with open(os.path.join(self.tmp_path, dir_, name), 'w') as f:
+            f.write(content)
+
+    def load(self, name):
+        path = os.path.join(self.tmp_path, name, 'workload_gen.py')
+        return ModuleLoader.load_by_path(path, name, 'scotty.workload')
+
+    def test_load_helper_without_syspath(self):
+        sys_path = list(sys.path)
+        module_ = self.load('workload_1')
+        self.assertEqual(module_.run(None), 42)
+        self.assertEqual(sys.path, sys_path)
+        self.assertNotIn('workload_helper', sys.modules)
+        helper_name = module_.__package__ + '.workload_helper'
+        self.assertIn(helper_name, sys.modules)
+        ModuleLoader.unload(module_)
+
+    def test_code_cached_by_source(self):
+        module_1 = self.load('workload_1')
+        module_2 = self.load('workload_2')
+        self.assertIsNot(module_1, module_2)
+        self.assertIs(module_1.run.__code__, module_2.run.__code__)
+        self.assertIsNot(module_1.workload_helper, module_2.workload_helper)
+        ModuleLoader.unload(module_1)
+        ModuleLoader.unload(module_2)
+
+    def test_code_cache_bounded(self):
+        path = os.path.join(self.tmp_path, 'workload_1', 'workload_gen.py')
+        code = ModuleLoader.get_code(path)
+        for index in range(ModuleLoader.code_cache_size):
+            self.write('workload_2', 'workload_gen.py', 'value = {}\n'.format(index))
+            ModuleLoader.get_code(os.path.join(self.tmp_path, 'workload_2', 'workload_gen.py'))
+        self.assertEqual(len(ModuleLoader._code_cache), ModuleLoader.code_cache_size)
+        self.assertIsNot(ModuleLoader.get_code(path), code)
+
+    def test_load_bytecode(self):
+        path = os.path.join(self.tmp_path, 'workload_1', 'workload_gen.py')
+        self.assertIsNone(ModuleLoader._load_bytecode(path))
+        py_compile.compile(path)
+        code = ModuleLoader._load_bytecode(path)
+        self.assertEqual(code.co_filename, path)
+        os.utime(path, (0, 0))
+        self.assertIsNone(ModuleLoader._load_bytecode(path))
+
+    def test_unload(self):
+        module_ = self.load('workload_1')
+        package_name = module_.__package__
+        ModuleLoader.unload(module_)
+        loaded = [name for name in sys.modules if name.startswith(package_name)]
+        self.assertEqual(loaded, [])
+
+    def test_unload_failed_module(self):
+        self.write('workload_1', 'workload_gen.py', 'raise ValueError()\n')
+        ModuleLoader.create_parent_module('scotty.workload')
+        modules = set(sys.modules)
+        with self.assertRaises(ValueError):
+            self.load('workload_1')
+        self.assertEqual(set(sys.modules) - modules, set())
@@ -0,0 +1,49 @@
+import unittest
+
+import mock
+
+from scotty.core.exceptions import ScottyException
+from scotty.core.reducer import Reducer
+
+
+class ReducerTest(unittest.TestCase):
+    def test_list(self):
+        self.assertEqual(Reducer.reduce('list', ['a', 'b']), ['a', 'b'])
+
+    def test_sum(self):
+        results = [
+            {'throughput': 10, 'latency': {'0.1': 5, '0.2': 1}, 'buckets': [1, 2]},
+            {'throughput': 20, 'latency': {'0.1': 3, '0.5': 2}, 'buckets': [3, 4]},
+        ]
+        self.assertEqual(Reducer.reduce('sum', results), {
+            'throughput': 30,
+            'latency': {'0.1': 8, '0.2': 1, '0.5': 2},
+            'buckets': [4, 6],
+        })
+        self.assertEqual(Reducer.reduce('histogram', results)['latency']['0.1'], 8)
+
+    def test_mean_min_max(self):
+        self.assertEqual(Reducer.reduce('mean', [1, 2]), 1.5)
+        self.assertEqual(Reducer.reduce('min', [{'p99': 3}, {'p99': 1}]), {'p99': 1})
+        self.assertEqual(Reducer.reduce('max', [{'p99': 3}, {'p99': 1}]), {'p99': 3})
+
+    def test_reduce_keys(self):
+        results = [
+            {'throughput': 10, 'p99': 0.2, 'host': 'a'},
+            {'throughput': 20, 'p99': 0.3, 'host': 'b'}]
+        reduced = Reducer.reduce({'throughput': 'sum', 'p99': 'max'}, results)
+        self.assertEqual(reduced, {'throughput': 30, 'p99': 0.3, 'host': ['a', 'b']})
+        with self.assertRaises(ScottyException):
+            Reducer.reduce({'throughput': 'sum'}, [1, 2])
+
+    def test_custom(self):
+        workload = mock.Mock()
+        workload.module.merge.return_value = 'merged'
+        self.assertEqual(Reducer.reduce('merge', [1, 2], workload), 'merged')
+        workload.module.merge.assert_called_once_with([1, 2])
+        self.assertEqual(Reducer.get_custom_reducers({'a': 'sum', 'b': 'merge'}), ['merge'])
+
+    def test_merge_error(self):
+        for results in [['a', 'b'], [[1], [1, 2]]]:
+            with self.assertRaises(ScottyException):
+                Reducer.reduce('sum', results)
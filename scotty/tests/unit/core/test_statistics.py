@@ -0,0 +1,53 @@
+import unittest
+
+import numpy
+
+from scotty.core.statistics import Statistics
+
+
+class StatisticsTest(unittest.TestCase):
+    def _samples(self, results, durations=None):
+        durations = durations or [1.0] * len(results)
+        return [{'result': result, 'duration': duration}
+                for result, duration in zip(results, durations)]
+
+    def test_describe(self):
+        stats = Statistics.describe([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(stats['n'], 5)
+        self.assertAlmostEqual(stats['mean'], 3.0)
+        self.assertAlmostEqual(stats['stddev'], numpy.sqrt(2.5))
+        self.assertAlmostEqual(stats['median'], 3.0)
+        self.assertAlmostEqual(stats['p99'], 4.96)
+        half_width = 2.776 * numpy.sqrt(2.5) / numpy.sqrt(5)
+        self.assertAlmostEqual(stats['ci_low'], 3.0 - half_width)
+        self.assertAlmostEqual(stats['ci_high'], 3.0 + half_width)
+
+    def test_describe_columns(self):
+        stats = Statistics.describe([[1.0, 10.0], [3.0, 30.0]])
+        numpy.testing.assert_allclose(stats['mean'], [2.0, 20.0])
+
+    def test_describe_empty(self):
+        self.assertIsNone(Statistics.describe([]))
+
+    def test_t_quantile(self):
+        self.assertEqual(Statistics.t_quantile(1), 12.706)
+        self.assertEqual(Statistics.t_quantile(100, 0.99), 2.576)
+
+    def test_summarize_numbers(self):
+        summary = Statistics.summarize(self._samples([2, 4], [1.0, 3.0]))
+        self.assertIsInstance(summary['values']['result'], numpy.ndarray)
+        self.assertEqual(summary['summary']['result']['mean'], 3.0)
+        self.assertIsInstance(summary['summary']['result']['mean'], float)
+        self.assertEqual(summary['summary']['duration']['mean'], 2.0)
+
+    def test_summarize_metrics(self):
+        results = [{'throughput': 100, 'latency': 0.5}, {'throughput': 300, 'latency': 1.5}]
+        summary = Statistics.summarize(self._samples(results))
+        numpy.testing.assert_allclose(summary['values']['result']['throughput'], [100, 300])
+        self.assertEqual(summary['summary']['result']['throughput']['mean'], 200.0)
+        self.assertEqual(summary['summary']['result']['latency']['max'], 1.5)
+
+    def test_summarize_not_numeric(self):
+        summary = Statistics.summarize(self._samples(['result', 'result']))
+        self.assertNotIn('result', summary['summary'])
+        self.assertIn('duration', summary['summary'])
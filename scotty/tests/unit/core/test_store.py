@@ -0,0 +1,124 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from scotty.core.checkout import FileLock
+from scotty.core.exceptions import ScottyException
+from scotty.core.store import ComponentStore
+
+
+class ComponentStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp()
+        self.source_path = os.path.join(self.tmp_path, 'source')
+        self.store_path = os.path.join(self.tmp_path, 'store')
+        os.makedirs(os.path.join(self.source_path, '.git'))
+        os.makedirs(self.store_path)
+        self.write('workload_gen.py', 'def run(context):\n    pass\n')
+        self.write('workload_gen.pyc', 'bytecode')
+        self.write('.git/HEAD', 'ref: refs/heads/master')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_path)
+
+    def write(self, rel_path, content):
+        with open(os.path.join(self.source_path, rel_path), 'w') as f:
+            f.write(content)
+
+    def test_tree_hash(self):
+        tree_hash = ComponentStore.tree_hash(self.source_path)
+        self.write('workload_gen.pyc', 'other bytecode')
+        self.assertEqual(ComponentStore.tree_hash(self.source_path), tree_hash)
+        self.write('workload_gen.py', 'def run(context):\n    return 1\n')
+        self.assertNotEqual(ComponentStore.tree_hash(self.source_path), tree_hash)
+
+    def test_tree_hash_digests(self):
+        file_path = os.path.join(self.source_path, 'workload_gen.py')
+        os.utime(file_path, (time.time() - 60, time.time() - 60))
+        digests = {}
+        tree_hash = ComponentStore.tree_hash(self.source_path, digests)
+        self.assertEqual(digests.keys(), [file_path])
+        digests[file_path][3] = 'cached'
+        self.assertNotEqual(ComponentStore.tree_hash(self.source_path, digests), tree_hash)
+        self.write('workload_gen.py', 'def run(context):\n    return 1\n')
+        ComponentStore.tree_hash(self.source_path, digests)
+        self.assertEqual(digests, {})
+
+    def test_add_saves_digests(self):
+        file_path = os.path.join(self.source_path, 'workload_gen.py')
+        os.utime(file_path, (time.time() - 60, time.time() - 60))
+        ComponentStore.add(self.store_path, self.source_path)
+        digests = ComponentStore._load_digests(self.store_path)
+        self.assertEqual(digests.keys(), [file_path])
+
+    def test_add(self):
+        entry_path = ComponentStore.add(self.store_path, self.source_path)
+        self.assertEqual(os.path.basename(entry_path), ComponentStore.tree_hash(self.source_path))
+        entry_file = os.path.join(entry_path, 'workload_gen.py')
+        source_file = os.path.join(self.source_path, 'workload_gen.py')
+        self.assertFalse(os.path.samefile(entry_file, source_file))
+        self.assertFalse(os.stat(entry_file).st_mode & (stat.S_IWUSR | stat.S_IWGRP))
+        self.assertTrue(os.stat(source_file).st_mode & stat.S_IWUSR)
+        self.assertFalse(os.path.exists(os.path.join(entry_path, '.git')))
+        self.assertFalse(os.path.exists(os.path.join(entry_path, 'workload_gen.pyc')))
+        self.assertEqual(ComponentStore.add(self.store_path, self.source_path), entry_path)
+        self.assertEqual(len(ComponentStore.get_entries(self.store_path)), 1)
+
+    def test_compile(self):
+        entry_path = ComponentStore.add(self.store_path, self.source_path)
+        ComponentStore.compile(entry_path)
+        self.assertTrue(os.path.isfile(os.path.join(entry_path, 'workload_gen.pyc')))
+        self.assertTrue(os.path.isfile(entry_path + '.compiled'))
+        self.assertEqual(ComponentStore.tree_hash(entry_path), os.path.basename(entry_path))
+        os.remove(os.path.join(entry_path, 'workload_gen.pyc'))
+        ComponentStore.compile(entry_path)
+        self.assertFalse(os.path.isfile(os.path.join(entry_path, 'workload_gen.pyc')))
+        ComponentStore.gc(self.store_path, max_age=-1, grace=0)
+        self.assertFalse(os.path.isfile(entry_path + '.compiled'))
+        self.assertTrue(os.path.isfile(entry_path + '.lock'))
+
+    def test_gc_max_age(self):
+        entry_path = ComponentStore.add(self.store_path, self.source_path)
+        self.write('workload_gen.py', 'def run(context):\n    return 1\n')
+        new_entry_path = ComponentStore.add(self.store_path, self.source_path)
+        os.utime(entry_path, (time.time() - 7200, time.time() - 7200))
+        removed = ComponentStore.gc(self.store_path, max_age=3600)
+        self.assertEqual(removed, [entry_path])
+        self.assertTrue(os.path.isdir(new_entry_path))
+
+    def test_gc_grace(self):
+        entry_path = ComponentStore.add(self.store_path, self.source_path)
+        self.assertEqual(ComponentStore.gc(self.store_path, max_age=-1), [])
+        self.assertTrue(os.path.isdir(entry_path))
+
+    def test_gc_locked(self):
+        entry_path = ComponentStore.add(self.store_path, self.source_path)
+        with FileLock.lock(entry_path):
+            self.assertEqual(ComponentStore.gc(self.store_path, max_age=-1, grace=0), [])
+        self.assertTrue(os.path.isdir(entry_path))
+
+    def test_gc_max_size_lru(self):
+        entry_paths = []
+        for index in range(3):
+            self.write('workload_gen.py', 'def run(context):\n    return {}\n'.format(index))
+            entry_path = ComponentStore.add(self.store_path, self.source_path)
+            mtime = time.time() - 7200 + index
+            os.utime(entry_path, (mtime, mtime))
+            entry_paths.append(entry_path)
+        entry_size = ComponentStore.get_entries(self.store_path)[0]['size']
+        removed = ComponentStore.gc(
+            self.store_path, max_size=2 * entry_size, keep=[entry_paths[0]])
+        self.assertEqual(removed, [entry_paths[1]])
+        entries = [entry['path'] for entry in ComponentStore.get_entries(self.store_path)]
+        self.assertEqual(entries, [entry_paths[0], entry_paths[2]])
+
+    def test_parse_limits(self):
+        self.assertEqual(ComponentStore.parse_size('2G'), 2 * 1024 ** 3)
+        self.assertEqual(ComponentStore.parse_size('512'), 512)
+        self.assertEqual(ComponentStore.parse_age('7d'), 7 * 86400)
+        self.assertIsNone(ComponentStore.parse_age(''))
+        with self.assertRaises(ScottyException):
+            ComponentStore.parse_size('two gigabytes')
@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import unittest
+
+import scotty.cli as cli
+from scotty.cmd.base import CommandRegistry
+
+
+class CliTest(unittest.TestCase):
+    def imported_modules(self, statement):
+        script = '{}\nimport sys\nprint(" ".join(sys.modules))'.format(statement)
+        output = subprocess.check_output([sys.executable, '-c', script])
+        return output.split()
+
+    def test_import_without_commands(self):
+        modules = self.imported_modules('import scotty.cli')
+        for module_ in ['git', 'yaml', 'scotty.cmd.workload', 'scotty.workflows.workflows']:
+            self.assertNotIn(module_, modules)
+
+    def test_parse_loads_selected_command(self):
+        modules = self.imported_modules(
+            'import scotty.cli\ncli = scotty.cli.Cli()\ncli.parse_command(["workload"])')
+        self.assertIn('scotty.cmd.workload', modules)
+        for module_ in ['git', 'yaml', 'scotty.cmd.experiment', 'scotty.workflows.workflows']:
+            self.assertNotIn(module_, modules)
+
+    def test_init_workflows_without_executor(self):
+        modules = self.imported_modules('import scotty.workflows.workflows')
+        for module_ in ['numpy', 'git', 'scotty.core.executor', 'scotty.core.report']:
+            self.assertNotIn(module_, modules)
+
+    def test_commands_registered(self):
+        commands = CommandRegistry.getcommands()
+        self.assertEqual(commands[:4], ['workload', 'experiment', 'resource', 'cache'])
+
+    def test_parse_command(self):
+        cli_ = cli.Cli()
+        cli_.parse_command(['experiment'])
+        cli_.parse_command_options(['perform', '-w', 'samples/components/experiment'])
+        self.assertEqual(cli_.options.action, 'perform')
+        self.assertEqual(cli_.command_class.__module__, 'scotty.cmd.experiment')
+
+    def test_parse_cache_gc_grace(self):
+        cli_ = cli.Cli()
+        cli_.parse_command(['cache'])
+        cli_.parse_command_options(['gc', '--max-size', '1', '--grace', '0'])
+        self.assertEqual(cli_.options.action, 'gc')
+        self.assertEqual(cli_.options.grace, '0')
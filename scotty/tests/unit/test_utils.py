@@ -5,6 +5,7 @@ import uuid
 from scotty.core.executor import ComponentExecutor
 from scotty.core.components import Experiment
 from scotty import utils 
+from scotty.core.exceptions import ScottyException
 
 class ExperimentHelperTest(unittest.TestCase):
 
@@ -31,6 +32,28 @@ class ExperimentHelperTest(unittest.TestCase):
         uuid_string = str(uuid)
         self.assertTrue(self.validate_uuid4(uuid_string))
 
+    @mock.patch('scotty.core.context.Context')
+    def test_get_path(self, context_mock):
+        context_mock.v1._ContextV1__base_path = '/experiment'
+        experiment_helper = utils.ExperimentHelper(context_mock)
+        path = experiment_helper.get_path('data/file.txt')
+        self.assertEqual(path, '/experiment/data/file.txt')
+
+    @mock.patch('scotty.core.context.Context')
+    def test_get_path_absolute(self, context_mock):
+        experiment_helper = utils.ExperimentHelper(context_mock)
+        with self.assertRaises(ScottyException):
+            experiment_helper.get_path('/data/file.txt')
+
+    def test_parse_duration(self):
+        self.assertEqual(utils.parse_duration('90'), 90)
+        self.assertEqual(utils.parse_duration('10m'), 600)
+        self.assertEqual(utils.parse_duration(' 2H '), 7200)
+        self.assertIsNone(utils.parse_duration(None))
+        with self.assertRaises(ScottyException) as context:
+            utils.parse_duration('ten minutes')
+        self.assertEqual(str(context.exception), 'Invalid duration: ten minutes')
+
     def validate_uuid4(self, uuid_string):
         try:
             val = uuid.UUID(uuid_string, version=4)
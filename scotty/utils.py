@@ -1,24 +1,42 @@
 import logging
 import os
+import re
 from contextlib import contextmanager
 
 from scotty.core.exceptions import ScottyException
 
 logger = logging.getLogger(__name__)
 
+_pattern_duration = re.compile(r'^(\d+)\s*([smhdw]?)$', re.IGNORECASE)
+_duration_units = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(duration):
+    """Seconds of a duration like 90, 90s, 10m, 12h, 7d or 2w, None if empty"""
+    if duration is None or str(duration).strip() == '':
+        return None
+    match = _pattern_duration.match(str(duration).strip())
+    if not match:
+        raise ScottyException('Invalid duration: {}'.format(duration))
+    return int(match.group(1)) * _duration_units[match.group(2).lower()]
+
 
 class ExperimentHelper(object):
     def __init__(self, context):
         # TODO validate context - is from scotty and not a fake from customer component
         self.context = context
         self.__experiment = context.v1._ContextV1__experiment
+        self.__base_path = context.v1._ContextV1__base_path
 
-    @contextmanager
-    def open_file(self, rel_path):
+    def get_path(self, rel_path):
         if os.path.isabs(rel_path):
             raise ScottyException(
-                'Path for experiment file must be relative'.format(rel_path))
-        with open(rel_path, 'r') as f:
+                'Path for experiment file must be relative ({})'.format(rel_path))
+        return os.path.join(self.__base_path, rel_path)
+
+    @contextmanager
+    def open_file(self, rel_path):
+        with open(self.get_path(rel_path), 'r') as f:
             yield f
 
     def get_resource(self, resource_name):
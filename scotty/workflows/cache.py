@@ -0,0 +1,36 @@
+import logging
+
+from scotty.workflows.base import Workflow
+from scotty.core.store import ComponentStore
+from scotty.core.workspace import ExperimentWorkspace
+from scotty.utils import parse_duration
+
+logger = logging.getLogger(__name__)
+
+
+class CacheGcWorkflow(Workflow):
+    def _prepare(self):
+        self.workspace = ExperimentWorkspace(self._options.workspace)
+        self.workspace.create_base_paths()
+        max_size, max_age = ComponentStore.get_limits()
+        if self._options.max_size is not None:
+            max_size = ComponentStore.parse_size(self._options.max_size)
+        if self._options.max_age is not None:
+            max_age = ComponentStore.parse_age(self._options.max_age)
+        self._max_size = max_size
+        self._max_age = max_age
+        self._grace = None
+        if getattr(self._options, 'grace', None) is not None:
+            self._grace = parse_duration(self._options.grace)
+
+    def _run(self):
+        if self._max_size is None and self._max_age is None:
+            logger.warning('No store limits (max size, max age), nothing to collect')
+            return
+        logger.info('Collect garbage in {}'.format(self.workspace.store_path))
+        self.removed = ComponentStore.gc(
+            self.workspace.store_path, self._max_size, self._max_age, grace=self._grace)
+        logger.info('Removed {} entries from component store'.format(len(self.removed)))
+
+    def _clean(self):
+        pass
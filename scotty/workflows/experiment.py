@@ -3,6 +3,8 @@ from datetime import datetime
 import shutil
 import sys
 
+from concurrent import futures
+
 from scotty.workflows.base import Workflow
 from scotty.core.components import ExperimentFactory
 from scotty.core.components import ResourceFactory
@@ -13,27 +15,49 @@ from scotty.core.executor import ResourceDeployExecutor, ResourceCleanExecutor
 from scotty.core.executor import WorkloadRunExecutor, WorkloadCleanExecutor
 from scotty.core.executor import SystemCollectorCollectExecutor
 from scotty.core.executor import ResultStoreSubmitExecutor
+from scotty.core.executor import ResourceReleaseExecutor
+from scotty.core.executor import ConcurrencyLimits
+from scotty.core.exceptions import ExperimentException
+from scotty.core.store import ComponentStore
 
 logger = logging.getLogger(__name__)
 
 class ExperimentPerformWorkflow(Workflow):
     def _prepare(self):
         self._prepare_experiment()
-        self._prepare_resources()
-        self._prepare_systemcollectors()
-        self._prepare_workloads()
-        self._prepare_resultstores()
+        self._prepare_components()
 
     def _prepare_experiment(self):
         logger.info('Prepare experiment')
         self.experiment = ExperimentFactory.build(self._options)
         self.experiment.starttime = datetime.now()
-
-    def _prepare_resources(self):
-        logger.info('Prepare resources')
-        resource_configs = self.experiment.config.get('resources', [])
-        resources = map(self._prepare_resource, resource_configs)
-        map(self.experiment.add_component, resources)
+        self._teardown = self._get_teardown()
+        self._concurrency = ConcurrencyLimits(self.experiment)
+
+    def _get_teardown(self):
+        teardown = self.experiment.config.get('teardown', 'deferred')
+        if teardown not in ['deferred', 'eager']:
+            msg = 'Unsupported teardown {}, use "deferred" or "eager"'
+            raise ExperimentException(msg.format(teardown))
+        return teardown
+
+    def _prepare_components(self):
+        logger.info('Prepare components')
+        prepare_functions = [
+            ('resources', self._prepare_resource),
+            ('systemcollectors', self._prepare_systemcollector),
+            ('workloads', self._prepare_workload),
+            ('resultstores', self._prepare_resultstore),
+        ]
+        max_workers = self._concurrency.get_max_workers(phase='prepare')
+        with futures.ThreadPoolExecutor(max_workers) as prepare_executor:
+            prepare_futures = []
+            for config_section, prepare_function in prepare_functions:
+                for component_config in self.experiment.config.get(config_section) or []:
+                    future = prepare_executor.submit(prepare_function, component_config)
+                    prepare_futures.append(future)
+        for future in prepare_futures:
+            self.experiment.add_component(future.result())
 
     def _prepare_resource(self, resource_config):
         msg = 'Prepare resource {} ({})'
@@ -41,36 +65,18 @@ class ExperimentPerformWorkflow(Workflow):
         resource = ResourceFactory.build(resource_config, self.experiment)
         return resource
                                                      
-    def _prepare_systemcollectors(self):
-        logger.info('Prepare systemcollectors')
-        systemcollector_configs = self.experiment.config.get('systemcollectors', [])
-        systemcollectors = map(self._prepare_systemcollector, systemcollector_configs)
-        map(self.experiment.add_component, systemcollectors)
-
     def _prepare_systemcollector(self, systemcollector_config):
         msg = 'Prepare systemcollector {} ({})'
         logger.info(msg.format(systemcollector_config['name'], systemcollector_config['generator']))
         systemcollector = SystemCollectorFactory.build(systemcollector_config, self.experiment)
         return systemcollector
 
-    def _prepare_workloads(self):
-        logger.info('Prepare workloads')
-        workload_configs = self.experiment.config.get('workloads', [])
-        workloads = map(self._prepare_workload, workload_configs)
-        map(self.experiment.add_component, workloads)
-
     def _prepare_workload(self, workload_config):
         msg = 'Prepare workload {} ({})'
         logger.info(msg.format(workload_config['name'], workload_config['generator']))
         workload = WorkloadFactory.build(workload_config, self.experiment)
         return workload
 
-    def _prepare_resultstores(self):
-        logger.info('Prepare resultstores')
-        resultstore_configs = self.experiment.config.get('resultstores', [])
-        resultstores = map(self._prepare_resultstore, resultstore_configs)
-        map(self.experiment.add_component, resultstores)
-
     def _prepare_resultstore(self, resultstore_config):
         msg = 'Prepare resultstore {} ({})'
         logger.info(msg.format(resultstore_config['name'], resultstore_config['generator']))
@@ -78,56 +84,111 @@ class ExperimentPerformWorkflow(Workflow):
         return resultstore
 
     def _run(self):
+        self._start_process_pool()
         self._run_resources()
         self._run_systemcollectors()
         self._run_workloads()
+        self._collect_resources()
+        self._collect_systemcollectors()
         self._run_resultstores()
 
+    def _start_process_pool(self):
+        for components in self.experiment.components.itervalues():
+            for component in components.itervalues():
+                if component.executor == 'process':
+                    logger.info('Start process pool')
+                    self._concurrency.get_process_pool()
+                    return
+
     def _run_resources(self):
         logger.info('Deploy resources')
-        resource_deploy_executor = ResourceDeployExecutor()
-        resource_deploy_executor.submit_resources(self.experiment)
-        resource_deploy_executor.collect_endpoints()
+        self._resource_deploy_executor = ResourceDeployExecutor(self._concurrency)
+        self._resource_deploy_executor.submit_resources(self.experiment)
+
+    def _collect_resources(self):
+        self._resource_deploy_executor.collect_endpoints()
 
     def _run_systemcollectors(self):
-        logger.info('Run systemcollectors')
-        systemcollector_collect_executor = SystemCollectorCollectExecutor()
-        systemcollector_collect_executor.submit_systemcollectors(self.experiment)
-        systemcollector_collect_executor.wait()
+        logger.info('Run systemcollectors once the resources are deployed')
+        self._systemcollector_collect_executor = SystemCollectorCollectExecutor(
+            self._concurrency)
+        self._systemcollector_collect_executor.submit_systemcollectors(
+            self.experiment,
+            self._resource_deploy_executor)
+
+    def _collect_systemcollectors(self):
+        self._systemcollector_collect_executor.wait()
 
     def _run_workloads(self):
-        logger.info('Run workloads')
-        workload_run_executor = WorkloadRunExecutor()
-        workload_run_executor.submit_workloads(self.experiment)
+        logger.info('Run workloads once their resources are deployed and collected')
+        self._resource_release_executor = None
+        if self._teardown == 'eager':
+            self._resource_release_executor = ResourceReleaseExecutor(
+                self.experiment,
+                self._concurrency,
+                self._systemcollector_collect_executor)
+        workload_run_executor = WorkloadRunExecutor(
+            self._concurrency,
+            self._resource_release_executor)
+        workload_run_executor.submit_workloads(
+            self.experiment,
+            self._resource_deploy_executor,
+            self._systemcollector_collect_executor)
         workload_run_executor.collect_results()
 
     def _run_resultstores(self):
         logger.info('Run resultstore')
-        resultstore_submit_executor = ResultStoreSubmitExecutor()
+        resultstore_submit_executor = ResultStoreSubmitExecutor(self._concurrency)
         resultstore_submit_executor.submit_resultstores(self.experiment)
         resultstore_submit_executor.wait()
 
     def _clean(self):
-        self._clean_workloads()
-        self._clean_resources()
+        if self._resource_release_executor is not None:
+            self._clean_released()
+        else:
+            self._clean_workloads()
+            self._clean_resources()
         self._clean_experiment()
 
+    def _clean_released(self):
+        logger.info('Wait for eager teardown of workloads and resources')
+        self._resource_release_executor.wait()
+
     def _clean_workloads(self):
         logger.info('Clean workloads')
-        workload_clean_executor = WorkloadCleanExecutor()
+        workload_clean_executor = WorkloadCleanExecutor(self._concurrency)
         workload_clean_executor.submit_workloads(self.experiment)
         workload_clean_executor.wait()
 
     def _clean_resources(self):
         logger.info('Clean resources')
-        resources_clean_executor = ResourceCleanExecutor()
+        resources_clean_executor = ResourceCleanExecutor(self._concurrency)
         resources_clean_executor.submit_resources(self.experiment)
         resources_clean_executor.wait()
 
     def _clean_experiment(self):
+        self._concurrency.shutdown()
+        self._unload_modules()
+        self._clean_store()
         if self.experiment.has_errors():
             sys.exit(1)
 
+    def _unload_modules(self):
+        for components in self.experiment.components.values():
+            for component in components.values():
+                component.unload_module()
+
+    def _clean_store(self):
+        max_size, max_age = ComponentStore.get_limits()
+        if max_size is None and max_age is None:
+            return
+        keep = [source.result().path for source in self.experiment.sources.values()
+                if source.done() and not source.exception()]
+        removed = ComponentStore.gc(
+            self.experiment.workspace.store_path, max_size, max_age, keep)
+        logger.info('Removed {} entries from component store'.format(len(removed)))
+
+
 class ExperimentCleanWorkflow(Workflow):
     def _prepare(self):
         self.experiment = ExperimentFactory.build(self._options)
@@ -1,26 +1,14 @@
 import logging
-import yaml
 import os
 
 import shutil
 
 from scotty.config import ScottyConfig
-from scotty.core.checkout import CheckoutManager
-from scotty.core.moduleloader import ModuleLoader
 from scotty.core.workspace import Workspace
 from scotty.core.components import Experiment
 from scotty.core.components import Workload
 from scotty.core.components import Resource
-from scotty.core.components import ComponentValidator
-from scotty.core.components import ResourceState
-from scotty.core.components import WorkloadState
-from scotty.core.context import Context
-from scotty.core.exceptions import ResourceException
-from scotty.core.exceptions import WorkloadException
 from scotty.core.exceptions import ScottyException
-from scotty.core.report import ReportCollector
-from scotty.core.executor import WorkloadRunExecutor
-from scotty.core.executor import ResourceDeployExecutor
 
 logger = logging.getLogger(__name__)
 